@@ -1,46 +1,67 @@
+import time
+ImportStartTime = time.monotonic()
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
-from gpiozero import LED
-from iso3166 import countries
+from email.utils import formatdate
+from functools import partial
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from json import dumps, loads
-from uk_covid19 import Cov19API
-import asyncio, discord, flag, lcddriver, os, requests, time, traceback
+from tempfile import mkdtemp
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+import asyncio, atexit, discord, gzip, os, random, requests, selectors, shutil, sys, threading, traceback
 
 # Global Constants
 Version = "7.0"
 BeginTime = "1540"
 DelayTime = 15
+APITimeout = 60
+BannerCacheTTL = 60
+BlockingThreshold = None
+RevisionWindow = 14
+MessagesRetentionDays = None
+MetricsPort = None
+GetDataRangeLimit = 31
+SchedulerMaxSleep = 60
+PollSlowInterval = 300
+PollMaxInterval = 600
+PublishTimesHistory = 30
+PublishTimesMinimum = 5
+SimulationHistoryLength = 1000
+LogQueueLength = 1000
+LogFlushInterval = 2
+TimingStatsDays = 7
+LoopLagInterval = 1
+BlockingCheckInterval = 0.1
+BlockingOrigins = {
+  "APICheck": "APICheck",
+  "on_message": "on_message",
+  "RunJob": "TimeReview",
+  "TimeReview": "TimeReview"
+}
+ClockJumpTolerance = 30
+RollingAverageLengths = {
+  "Three": 3,
+  "Seven": 7
+}
 DataAggregationTemplate = {
   "Date": None,
   "Day": None,
   "Cases": {
     "New": None,
     "Change": None,
-    "RollingAverages": {
-      "Three": {
-        "Average": None,
-        "Change": None,
-      },
-      "Seven": {
-        "Average": None,
-        "Change": None
-      }
-    },
+    "RollingAverages": {Length: {"Average": None, "Change": None} for Length in RollingAverageLengths},
     "Corrections": None,
     "Total": None
   },
   "Deaths": {
     "New": None,
     "Change": None,
-    "RollingAverages": {
-      "Three": {
-        "Average": None,
-        "Change": None,
-      },
-      "Seven": {
-        "Average": None,
-        "Change": None
-      }
-    },
+    "RollingAverages": {Length: {"Average": None, "Change": None} for Length in RollingAverageLengths},
     "Corrections": None,
     "Total": None
   },
@@ -53,6 +74,14 @@ Metrics = [
   "Cases",
   "Deaths"
 ]
+MassDataMissingFloat = float("nan")
+MassDataMissingInt = -2 ** 63
+MassDataHeader = {
+  "Format": "UKCOVID19 AllData",
+  "Version": 1,
+  "Order": "Oldest first"
+}
+MassDataLatestFormat = "UKCOVID19 AllData Latest"
 NetworkTestAddresses = []
 TimeoutTime = "0000"
 
@@ -81,15 +110,67 @@ SecondaryStructure = {
 SecondaryLatestBy = "newPeopleVaccinatedFirstDoseByPublishDate"
 
 # COVID API Instantiations
-PrimaryAPI = Cov19API(Filters, PrimaryStructure, PrimaryLatestBy)
-SecondaryAPI = Cov19API(Filters, SecondaryStructure, SecondaryLatestBy)
-AllDataAPI = Cov19API(Filters, PrimaryStructure)
+PrimaryAPI = None
+SecondaryAPI = None
+AllDataAPI = None
+APIExecutor = ThreadPoolExecutor(max_workers=2)
+BannerExecutor = ThreadPoolExecutor(max_workers=4)
+MassDataExecutor = ThreadPoolExecutor(max_workers=1)
+APISession = requests.Session()
+BannerSession = requests.Session()
+BannerCache = {}
+BannerCacheStats = {
+  "Hits": 0,
+  "Misses": 0,
+  "NotModified": 0
+}
+
+# Retry Constants
+RetryPolicies = {
+  "API": {
+    "Attempts": 5,
+    "BaseDelay": 5,
+    "MaxDelay": 300,
+    "Timeout": None,
+    "FailureThreshold": 5,
+    "CoolDown": 300
+  },
+  "Banners": {
+    "Attempts": 3,
+    "BaseDelay": 2,
+    "MaxDelay": 30,
+    "Timeout": 15,
+    "FailureThreshold": 3,
+    "CoolDown": 900
+  },
+  "Sync": {
+    "Attempts": 3,
+    "BaseDelay": 5,
+    "MaxDelay": 60,
+    "Timeout": None,
+    "FailureThreshold": 5,
+    "CoolDown": 300
+  },
+  "Network": {
+    "Attempts": None,
+    "BaseDelay": 2,
+    "MaxDelay": 60,
+    "Timeout": 10,
+    "FailureThreshold": None,
+    "CoolDown": 0
+  }
+}
+CircuitBreakers = {}
 
 # COVID Pi GPIO Constants
-Display = lcddriver.lcd()
-ErrorLED = LED(14)
-OldLED = LED(15)
-NewLED = LED(18)
+Display = None
+DisplayExecutor = ThreadPoolExecutor(max_workers=1)
+DisplayLineOffsets = [0x00, 0x40, 0x14, 0x54]
+DisplayRegisterSelect = None
+DisplayWidth = 20
+ErrorLED = None
+OldLED = None
+NewLED = None
 
 # Discord Constants
 DiscordClient = discord.Client()
@@ -102,10 +183,21 @@ Files = {
   "Config": "config.json",
   "ErrorLogs": "",
   "Messages": "",
+  "PublishTimes": None,
   "RollAvgPeaks": "",
   "RuntimeLogs": "",
+  "Timings": None,
   "Variants": None
 }
+SimulationFiles = {
+  "AllData": "AllData.json",
+  "ErrorLogs": "",
+  "Messages": "Messages.json",
+  "PublishTimes": "PublishTimes.json",
+  "RollAvgPeaks": "RollAvgPeaks.json",
+  "RuntimeLogs": "RuntimeLog_%DATE%.txt",
+  "Timings": "Timings.json"
+}
 
 # Messages Addresses
 StatusMessagesAddresses = {
@@ -114,6 +206,30 @@ StatusMessagesAddresses = {
 }
 
 # Global Variables
+AllDataStore = None
+BlockingReports = {}
+BlockingStack = None
+CompressLogs = False
+LogFlushLock = threading.Lock()
+LogLock = threading.Lock()
+LogQueue = deque()
+LogWriter = None
+LastLogFilename = None
+LogCompressionPending = False
+LoopHeartbeat = None
+LoopThread = None
+LastHighestIndex = {}
+LastHighestStack = {}
+MassDataFields = None
+MassDataLoadLock = threading.Lock()
+MassDataSupersededRecords = 0
+MassDataDateIndex = {}
+MassDataDates = []
+MessagesStore = None
+MessagesIndex = {}
+MessagesDateIndex = {}
+MessagesFileState = None
+PublishTimes = None
 CurrentDisplay = [
   "Cases".center(10) + "|" + "Deaths".center(9),
   "X",
@@ -121,32 +237,103 @@ CurrentDisplay = [
   "X"
 ]
 DateOfCurrentData = "1970-01-01"
+DisplayBuffer = None
 ErrorMode = False
 ExcludedDates = []
-LatestRecordFormatted = loads(dumps(DataAggregationTemplate))
+LatestRecordFormatted = None
 PrimaryUpdated = False
+JobTasks = set()
+ScheduledJobs = []
+Searching = False
+SearchTimedOut = False
 SecondaryUpdated = False
+MetricCounters = {}
+MetricGauges = {}
+MetricsServer = None
+ReplayBusy = 0
+ReplayClock = 0
+ReplayEpoch = None
+ReplayFinished = False
+Replaying = False
+Simulated = False
+SimulationChannel = None
+SimulationDirectory = None
+SimulationLock = threading.Lock()
+SimulationRecordings = None
+SimulationReleaseTimes = {}
+SimulationRequests = {
+  "API": 0,
+  "Banners": 0,
+  "Network": 0
+}
+SimulationServer = None
+StartupTime = None
+TimingLock = threading.Lock()
+TimingStats = {}
+TimingTotals = {}
 UKPopulation = None
 VariantsEnable = False
 
 # Startup Procedures
+def InitialiseHardware():
+  global Display, DisplayRegisterSelect, ErrorLED, NewLED, OldLED
+  if Simulated:
+    Display = VirtualDisplay()
+    DisplayRegisterSelect = VirtualDisplay.Rs
+    ErrorLED = RecordedLED(14)
+    OldLED = RecordedLED(15)
+    NewLED = RecordedLED(18)
+    return
+  from gpiozero import LED
+  import lcddriver
+  Display = lcddriver.lcd()
+  DisplayRegisterSelect = lcddriver.Rs
+  ErrorLED = LED(14)
+  OldLED = LED(15)
+  NewLED = LED(18)
+
+def InitialiseAPIs():
+  global AllDataAPI, PrimaryAPI, SecondaryAPI
+  PrimaryAPI = NewCov19API(Filters, PrimaryStructure, PrimaryLatestBy)
+  SecondaryAPI = NewCov19API(Filters, SecondaryStructure, SecondaryLatestBy)
+  AllDataAPI = NewCov19API(Filters, PrimaryStructure)
+
+def NewCov19API(Filters, Structure, LatestBy = None):
+  from uk_covid19 import Cov19API, api_interface
+  api_interface.request = SendAPIRequest
+  API = Cov19API(Filters, Structure, LatestBy)
+  if Simulated:
+    API.endpoint = "http://127.0.0.1:" + str(SimulationServer.server_port) + "/v1/data"
+  return API
+
+def SendAPIRequest(Method, Address, **Arguments):
+  Timeout = RetryPolicies["API"]["Timeout"]
+  if Timeout == None:
+    Timeout = APITimeout
+  Arguments.setdefault("timeout", Timeout)
+  return APISession.request(Method, Address, **Arguments)
+
+def RecordStartupTiming(Name, Duration):
+  WriteToMainLog(Name + " took " + str(round(Duration, 3)) + " seconds.")
+  RecordTiming(Name, Duration * 1000)
+
 def POST():
-  Display.lcd_clear()
-  Display.lcd_display_string("Welcome to COVID Pi.", 1)
-  Display.lcd_display_string("Version " + Version + ".", 2)
+  ClearDisplay()
+  DisplayString("Welcome to COVID Pi.", 1)
+  DisplayString("Version " + Version + ".", 2)
   for _ in range(2):
     ErrorLED.on()
-    time.sleep(0.5)
+    PauseFor(0.5)
     ErrorLED.off()
     OldLED.on()
-    time.sleep(0.5)
+    PauseFor(0.5)
     OldLED.off()
     NewLED.on()
-    time.sleep(0.5)
+    PauseFor(0.5)
     NewLED.off()
 
 def LoadConfig(Reload = False):
-  global BeginTime, BotToken, ChannelID, DelayTime, ExcludedDates, Files, NetworkTestAddresses, TimeoutTime, UKPopulation, VariantsEnable
+  global APITimeout, BannerCacheTTL, BeginTime, BlockingThreshold, BotToken, ChannelID, CompressLogs, DelayTime, ExcludedDates, Files, MessagesRetentionDays, MetricsPort, NetworkTestAddresses, RevisionWindow, TimeoutTime, UKPopulation, VariantsEnable
   WriteToMainLog("Loading configuration file. . .")
   if os.path.isfile(Files["Config"]):
     with open(Files["Config"]) as ConfigFile:
@@ -155,6 +342,18 @@ def LoadConfig(Reload = False):
     if ConfigFileContents.__contains__("Configuration"):
       WriteToMainLog("Loading general configuration. . .")
       Configuration = ConfigFileContents["Configuration"]
+      if Configuration.__contains__("APITimeout"):
+        APITimeout = Configuration["APITimeout"]
+      else:
+        WriteToMainLog("API timeout not found in file. Using default API timeout.")
+      if Configuration.__contains__("BannerCacheTTL"):
+        BannerCacheTTL = Configuration["BannerCacheTTL"]
+      else:
+        WriteToMainLog("Banner cache time to live not found in file. Using default banner cache time to live.")
+      if Configuration.__contains__("BlockingThreshold"):
+        BlockingThreshold = Configuration["BlockingThreshold"]
+      if Configuration.__contains__("CompressLogs"):
+        CompressLogs = Configuration["CompressLogs"]
       if Configuration.__contains__("ExcludedDates"):
         ExcludedDates = Configuration["ExcludedDates"]
       if not Reload:
@@ -162,6 +361,14 @@ def LoadConfig(Reload = False):
           NetworkTestAddresses = Configuration["NetworkTestAddresses"]
         else:
           raise Exception("Specified addresses for network test not found in file.")
+      if Configuration.__contains__("MessagesRetentionDays"):
+        MessagesRetentionDays = Configuration["MessagesRetentionDays"]
+      if Configuration.__contains__("MetricsPort"):
+        MetricsPort = Configuration["MetricsPort"]
+      if Configuration.__contains__("RevisionWindow"):
+        RevisionWindow = Configuration["RevisionWindow"]
+      else:
+        WriteToMainLog("Revision window not found in file. Using default revision window.")
       if Configuration.__contains__("StartSearchingTime"):
         BeginTime = Configuration["StartSearchingTime"]
       else:
@@ -217,16 +424,26 @@ def LoadConfig(Reload = False):
         Files["Messages"] = FileList["Messages"]
       else:
         WriteToMainLog("No messages file found in file. Defaulting to the parent folder of the script.")
+      if FileList.__contains__("PublishTimes"):
+        Files["PublishTimes"] = FileList["PublishTimes"]
+      else:
+        WriteToMainLog("Publish times file not found in file. Publish times will not be kept between restarts.")
       if FileList.__contains__("RollAvgPeaks"):
         Files["RollAvgPeaks"] = FileList["RollAvgPeaks"]
       else:
         raise Exception("Rolling Averages Peaks file not found in file.")
+      if FileList.__contains__("Timings"):
+        Files["Timings"] = FileList["Timings"]
+      else:
+        WriteToMainLog("Timings file not found in file. Timings will not be kept between restarts.")
       if VariantsEnable:
         if FileList.__contains__("Variants"):
           Files["Variants"] = FileList["Variants"]
         else:
           VariantsEnable = False
           WriteToMainLog("Variants file not found in file. Disabling variants function.")
+      if Simulated:
+        UseSimulationFiles()
       WriteToMainLog("Directories loaded.")
     else:
       raise Exception("File paths not found in file.")
@@ -237,21 +454,22 @@ def LoadConfig(Reload = False):
       if StatusMessages.__contains__("YellowBannersAddress"):
         StatusMessagesAddresses["YellowBannersAddress"] = StatusMessages["YellowBannersAddress"]
   else:
-    Display.lcd_display_string("No config file.")
+    DisplayString("No config file.", 1)
     raise Exception("The configuration file was not found in the specified directory.\nPlease check the file path and try again.")
 
 def WaitForNetwork():
   global NetworkTestAddresses
   ErrorMode = False
   SuccessfulNetworkCheck = False
+  NetworkAttempts = 0
   OldLED.on()
-  Display.lcd_display_string("Waiting for network.", 4)
+  DisplayString("Waiting for network.", 4)
   WriteToMainLog("Waiting for network connectivity. . .")
   while not SuccessfulNetworkCheck:
     try:
       for i in range(len(NetworkTestAddresses)):
         WriteToMainLog("Testing connection to IP address " + NetworkTestAddresses[i] + ". . .")
-        R = requests.get(NetworkTestAddresses[i])
+        R = requests.get(ResolveAddress(NetworkTestAddresses[i], "network"), timeout=RetryPolicies["Network"]["Timeout"])
         if R.status_code != 200 and R.status_code != 204:
           raise Exception("Request fail with status code " + str(R.status_code) + " on address " + NetworkTestAddresses[i])
         WriteToMainLog("Test completed with status code " + str(R.status_code) + ".")
@@ -262,7 +480,7 @@ def WaitForNetwork():
         NewLED.on()
         if i == 1:
           OldLED.off()
-        time.sleep(2)
+        PauseFor(2)
       SuccessfulNetworkCheck = True
     except:
       if not ErrorMode:
@@ -270,34 +488,37 @@ def WaitForNetwork():
         ErrorLED.on()
         ErrorMode = True
       PrintError()
-      time.sleep(5)
+      NetworkAttempts += 1
+      PauseFor(RetryDelay(RetryPolicies["Network"], NetworkAttempts))
   OldLED.off()
   NewLED.off()
 
 def ReloadLastOutput():
   global CurrentDisplay, DateOfCurrentData, ErrorMode
-  if os.path.isfile(Files["AllData"]):
-    if os.path.getsize(Files["AllData"]) > 8:
-      try:
-        with open(Files["AllData"], 'r') as AllDataFile:
-          NewestRecordFromFile = loads(AllDataFile.read())[0]
-        DateOfCurrentData = NewestRecordFromFile["Date"]
-        BuildDisplay(NewestRecordFromFile)
-      except:
-        PrintError()
-        ErrorMode = True
-        ErrorLED.on()
-        DateOfCurrentData = "1970-01-01"
-        CurrentDisplay[1] = "X"
-        CurrentDisplay[2] = "Previous data found,".center(20)
-        CurrentDisplay[3] = "Data is invalid.".center(20)
-        CommitDisplay(CurrentDisplay)
-    else:
-      WriteToMainLog("No previous data found.")
-      CurrentDisplay[2] = "No previous".center(20)
-      CurrentDisplay[3] = "data found.".center(20)
+  PreviousDataFound = os.path.isfile(Files["AllData"])
+  if PreviousDataFound:
+    try:
+      LatestRecord = ReadLatestRecord()
+      if LatestRecord == None:
+        WriteToMainLog("Latest record snapshot missing or out of date. Reading mass data store. . .")
+        AllData = GetAllData()
+        if len(AllData) != 0:
+          LatestRecord = AllData[0]
+          CommitLatestRecord()
+      PreviousDataFound = LatestRecord != None
+      if PreviousDataFound:
+        DateOfCurrentData = LatestRecord["Date"]
+        BuildDisplay(LatestRecord)
+    except:
+      PrintError()
+      ErrorMode = True
+      ErrorLED.on()
+      DateOfCurrentData = "1970-01-01"
+      CurrentDisplay[1] = "X"
+      CurrentDisplay[2] = "Previous data found,".center(20)
+      CurrentDisplay[3] = "Data is invalid.".center(20)
       CommitDisplay(CurrentDisplay)
-  else:
+  if not PreviousDataFound:
     WriteToMainLog("No previous data found.")
     CurrentDisplay[2] = "No previous".center(20)
     CurrentDisplay[3] = "data found.".center(20)
@@ -306,101 +527,198 @@ def ReloadLastOutput():
 # Common Procedures
 async def TimeReview():
   try:
-    global DataAggregationTemplate, ErrorMode, Files, LatestRecordFormatted, PrimaryUpdated, SecondaryUpdated, StatusMessagesAddresses
+    global ScheduledJobs
     await WaitForDiscord()
-    await DiscordClient.change_presence(status=discord.Status.idle)
-    WriteToMainLog("Beginning time loop.")
+    await SetPresence(discord.Status.idle)
+    WriteToMainLog("Beginning scheduler.")
+    ScheduledJobs = [
+      {
+        "Name": "Daily reset",
+        "Schedule": lambda After: NextDailyRun("0000", After),
+        "Function": PrepareForNewDay
+      },
+      {
+        "Name": "Mass data reload",
+        "Schedule": lambda After: NextWeeklyRun(1, "0000", After),
+        "Function": WeeklyMassDataReload
+      },
+      {
+        "Name": "Search timeout",
+        "Schedule": lambda After: NextDailyRun(TimeoutTime, After),
+        "Function": TimeOutSearch
+      },
+      {
+        "Name": "Start of search",
+        "Schedule": lambda After: NextDailyRun(BeginTime, After),
+        "Function": StartOfSearch
+      },
+      {
+        "Name": "Messages check",
+        "Schedule": NextMessagesCheck,
+        "Function": CheckForMessage
+      }
+    ]
+    await RescheduleJobs()
     while True:
-      CurrentDate = date.today().isoformat()
-      CurrentTime = datetime.now().strftime("%H%M")
-      Minutes = datetime.now().strftime("%M")
-      if DateOfCurrentData == CurrentDate and not PrimaryUpdated:
-        PrimaryUpdated = True
-        NewLED.on()
-        WriteToMainLog("Latest data confirmed.")
-      elif not ExcludedDates.__contains__(CurrentDate):
-        if CurrentTime >= BeginTime and not (PrimaryUpdated or SecondaryUpdated):
-          WriteToMainLog("Daily data load beginning.")
-          LatestRecordFormatted = loads(dumps(DataAggregationTemplate))
-          await APICheck()
-          WriteToMainLog("Daily data load ending.")
-          if PrimaryUpdated:
-            await CheckRollAvgPeaks()
-          await asyncio.sleep(90)
-          await CheckForMessage()
-        elif CurrentTime < BeginTime and PrimaryUpdated:
-          PrimaryUpdated = False
-          SecondaryUpdated = False
-          OldLED.off()
-          NewLED.off()
-          LatestRecordFormatted = loads(dumps(DataAggregationTemplate))
-          LoadConfig(False)
-          if date.today().weekday() == 1:
-            ReloadMassData()
-      else:
-        if CurrentTime == "0000" and PrimaryUpdated:
-          WriteToMainLog("--- NEW DAY ---", False)
-          PrimaryUpdated = False
-          SecondaryUpdated = False
-          OldLED.off()
-          NewLED.off()
-          if date.today().weekday() == 1:
-            ReloadMassData()
-        if not PrimaryUpdated:
-          PrimaryUpdated = True
-          WriteToMainLog("No update today.")
-          await SendMessage(CurrentDate, "No data is being released for this day.", "Bot Admin")
-      if Minutes == "00":
-        await CheckForMessage()
-        await asyncio.sleep(55)
-      await asyncio.sleep(5)
+      WallClock = GetCurrentTime()
+      Monotonic = GetMonotonicTime()
+      NextRun = min([Job["NextRun"] for Job in ScheduledJobs])
+      await asyncio.sleep(min(SchedulerMaxSleep, max(0, (NextRun - WallClock).total_seconds())))
+      Now = GetCurrentTime()
+      ClockJump = (Now - WallClock).total_seconds() - (GetMonotonicTime() - Monotonic)
+      if abs(ClockJump) > ClockJumpTolerance:
+        WriteToMainLog("System clock changed by " + str(round(ClockJump)) + " seconds. Running missed jobs and rescheduling. . .")
+        MissedJobs = [Job for Job in ScheduledJobs if Job["NextRun"] <= Now]
+        for Job in ScheduledJobs:
+          ScheduleJob(Job, Now)
+        StartJobTask(RunMissedJobs(MissedJobs))
+        continue
+      for Job in ScheduledJobs:
+        if Job["NextRun"] <= Now:
+          ScheduleJob(Job, Now)
+          StartJobTask(RunJob(Job))
   except:
     await FatalException()
 
+async def RescheduleJobs():
+  Now = GetCurrentTime()
+  for Job in ScheduledJobs:
+    ScheduleJob(Job, Now)
+  await CatchUpSchedule()
+
+async def RunMissedJobs(Jobs):
+  for Job in Jobs:
+    await RunJob(Job)
+  await CatchUpSchedule()
+
+def StartJobTask(Coroutine):
+  Task = DiscordClient.loop.create_task(Coroutine)
+  JobTasks.add(Task)
+  Task.add_done_callback(JobTasks.discard)
+
+def ScheduleJob(Job, After):
+  Job["NextRun"] = Job["Schedule"](After)
+  WriteToMainLog("Next run of " + Job["Name"].lower() + " job: " + Job["NextRun"].isoformat(sep=' ') + ".")
+
+async def RunJob(Job):
+  WriteToMainLog(Job["Name"] + " job started.")
+  try:
+    await Job["Function"]()
+  except:
+    PrintError()
+  WriteToMainLog(Job["Name"] + " job finished.")
+
+def NextDailyRun(Time, After):
+  NextRun = After.replace(hour=int(Time[0:2]), minute=int(Time[2:4]), second=0, microsecond=0)
+  if NextRun <= After:
+    NextRun += timedelta(days=1)
+  return NextRun
+
+def NextWeeklyRun(Weekday, Time, After):
+  NextRun = NextDailyRun(Time, After)
+  while NextRun.weekday() != Weekday:
+    NextRun += timedelta(days=1)
+  return NextRun
+
+def NextMessagesCheck(After):
+  if Searching:
+    Interval = 15
+  else:
+    Interval = 60
+  return After.replace(second=0, microsecond=0) + timedelta(minutes=Interval - After.minute % Interval)
+
+async def CatchUpSchedule():
+  global PrimaryUpdated
+  CurrentDate = GetCurrentDate().isoformat()
+  if DateOfCurrentData == CurrentDate and not PrimaryUpdated:
+    PrimaryUpdated = True
+    NewLED.on()
+    WriteToMainLog("Latest data confirmed.")
+  if ExcludedDates.__contains__(CurrentDate):
+    await CheckExcludedDay()
+  elif GetCurrentTime().strftime("%H%M") >= BeginTime:
+    StartJobTask(StartOfSearch())
+
+async def CheckExcludedDay():
+  global PrimaryUpdated
+  CurrentDate = GetCurrentDate().isoformat()
+  if ExcludedDates.__contains__(CurrentDate) and not PrimaryUpdated:
+    PrimaryUpdated = True
+    WriteToMainLog("No update today.")
+    await SendMessage(CurrentDate, "No data is being released for this day.", "Bot Admin")
+
+async def WaitForSearch():
+  while Searching:
+    await asyncio.sleep(DelayTime)
+
+async def StartOfSearch():
+  global LatestRecordFormatted, Searching, SearchTimedOut
+  if Searching or PrimaryUpdated or SecondaryUpdated or ExcludedDates.__contains__(GetCurrentDate().isoformat()):
+    return
+  Searching = True
+  SearchTimedOut = False
+  try:
+    WriteToMainLog("Daily data load beginning.")
+    LatestRecordFormatted = NewMassDataRecord()
+    await APICheck()
+    WriteToMainLog("Daily data load ending.")
+    if PrimaryUpdated:
+      with TimedSpan("CheckRollAvgPeaks"):
+        await CheckRollAvgPeaks()
+  finally:
+    Searching = False
+  await asyncio.sleep(90)
+  await CheckForMessage()
+
+async def TimeOutSearch():
+  global SearchTimedOut
+  if Searching:
+    WriteToMainLog("Search timeout reached.")
+    SearchTimedOut = True
+
+async def PrepareForNewDay():
+  global LatestRecordFormatted, PrimaryUpdated, SecondaryUpdated
+  await WaitForSearch()
+  WriteToMainLog("--- NEW DAY ---", False)
+  PrimaryUpdated = False
+  SecondaryUpdated = False
+  OldLED.off()
+  NewLED.off()
+  LatestRecordFormatted = NewMassDataRecord()
+  LoadConfig(False)
+  PruneMessages()
+  await CheckExcludedDay()
+
+async def WeeklyMassDataReload():
+  await WaitForSearch()
+  await ReloadMassData()
+
 async def APICheck():
   global CurrentDisplay, DateOfCurrentData, DelayTime, ErrorMode, LatestRecordFormatted, PrimaryUpdated, SecondaryUpdated
   await WaitForDiscord()
-  await DiscordClient.change_presence(status=discord.Status.online)
-  CurrentDate = date.today().isoformat()
-  PreviousDate = (date.today() - timedelta(days=1)).isoformat()
-  CurrentTime = datetime.today().strftime("%H%M")
-  Minutes = datetime.today().strftime("%M")
+  await SetPresence(discord.Status.online)
+  CurrentDate = GetCurrentDate().isoformat()
+  PreviousDate = (GetCurrentDate() - timedelta(days=1)).isoformat()
   OldLED.on()
-  MessagesChecked = False
-  while not (PrimaryUpdated and SecondaryUpdated) and CurrentTime != TimeoutTime:
-    CurrentTime = datetime.today().strftime("%H%M")
-    Minutes = datetime.today().strftime("%M")
-    if int(Minutes) % 15 == 0:
-      if not MessagesChecked:
-        await CheckForMessage()
-        MessagesChecked = True
-    else:
-      MessagesChecked = False
+  PreviousInterval = None
+  while not ((PrimaryUpdated and SecondaryUpdated) or SearchTimedOut):
+    IncrementMetric("api_polls_total")
+    Polls = []
     if not PrimaryUpdated:
-      try:
-        PrimaryUpdated = await PrimaryAPICheck(CurrentDate)
-        if ErrorMode:
-          if not PrimaryUpdated:
-            OldLED.on()
-          ErrorMode = False
-          ErrorLED.off()
-      except:
-        if not ErrorMode:
-          ErrorMode = True
-          OldLED.off()
-          ErrorLED.on()
-        PrintError()
+      Polls.append(PollPrimary(CurrentDate))
     if not SecondaryUpdated:
-      try:
-        SecondaryUpdated = await SecondaryAPICheck(PreviousDate)
-      except:
-        PrintError()
+      Polls.append(PollSecondary(PreviousDate))
+    await asyncio.gather(*Polls)
     if not (PrimaryUpdated and SecondaryUpdated):
-      await asyncio.sleep(DelayTime)
-  if CurrentTime == TimeoutTime and not (PrimaryUpdated and SecondaryUpdated):
+      Interval = GetPollInterval()
+      if Interval != PreviousInterval:
+        WriteToMainLog("Polling every " + str(round(Interval)) + " seconds.")
+        PreviousInterval = Interval
+      await asyncio.sleep(Interval)
+  if SearchTimedOut and not (PrimaryUpdated and SecondaryUpdated):
     ErrorMode = True
     ErrorLED.on()
-    await SendMessage(CurrentDate, "Remaining data not sent was not found for this day. Timed out.")
+    await SendMessage(CurrentDate, "Remaining data not sent was not found for this day. Timed out.", "Bot Admin")
     if not PrimaryUpdated:
       OldLED.off()
       DateOfCurrentData = "1970-01-01"
@@ -413,28 +731,111 @@ async def APICheck():
       CurrentDisplay = NewDisplay[0:4]
     if not SecondaryUpdated:
       WriteToMainLog("No secondary data found.")
-  await DiscordClient.change_presence(status=discord.Status.idle)
+  await SetPresence(discord.Status.idle)
+
+async def PollPrimary(Date):
+  global ErrorMode, PrimaryUpdated
+  try:
+    PrimaryUpdated = await PrimaryAPICheck(Date)
+    if PrimaryUpdated:
+      RecordPublishTime(Date)
+    if ErrorMode:
+      if not PrimaryUpdated:
+        OldLED.on()
+      ErrorMode = False
+      ErrorLED.off()
+  except:
+    if not ErrorMode:
+      ErrorMode = True
+      OldLED.off()
+      ErrorLED.on()
+    PrintError()
+
+async def PollSecondary(Date):
+  global SecondaryUpdated
+  try:
+    SecondaryUpdated = await SecondaryAPICheck(Date)
+  except:
+    PrintError()
+
+def GetPollInterval():
+  Now = GetCurrentTime()
+  Offset = GetSearchOffset(Now)
+  Window = GetPublishWindow()
+  if Window == None:
+    Interval = DelayTime
+  elif Offset < Window[0]:
+    Interval = max(DelayTime, min(PollSlowInterval, (Window[0] - Offset) / 2))
+  elif Offset <= Window[1]:
+    Interval = DelayTime
+  else:
+    Interval = min(PollMaxInterval, DelayTime * 2 ** ((Offset - Window[1]) // 900 + 1))
+  return max(1, min(Interval, (NextDailyRun(TimeoutTime, Now) - Now).total_seconds()))
+
+def GetSearchOffset(Time):
+  return ((Time.hour * 60 + Time.minute) * 60 + Time.second - (int(BeginTime[0:2]) * 60 + int(BeginTime[2:4])) * 60) % 86400
+
+def GetPublishWindow():
+  Offsets = sorted([GetSearchOffset(datetime.strptime(Time, "%H:%M:%S")) for Time in GetPublishTimes().values()])
+  if len(Offsets) < PublishTimesMinimum:
+    return None
+  return (Offsets[int(0.1 * (len(Offsets) - 1))], Offsets[int(0.9 * (len(Offsets) - 1))])
+
+def GetPublishTimes():
+  global PublishTimes
+  if PublishTimes == None:
+    PublishTimes = {}
+    if Files["PublishTimes"] != None and os.path.isfile(Files["PublishTimes"]):
+      with open(Files["PublishTimes"]) as PublishTimesFile:
+        PublishTimes = loads(PublishTimesFile.read())
+  return PublishTimes
+
+def RecordPublishTime(Date):
+  global PublishTimes
+  Times = GetPublishTimes()
+  Times[Date] = GetCurrentTime().strftime("%H:%M:%S")
+  PublishTimes = {}
+  for Key in sorted(Times)[-PublishTimesHistory:]:
+    PublishTimes[Key] = Times[Key]
+  WriteToMainLog("Data for " + Date + " published by " + PublishTimes[Date] + ".")
+  if Files["PublishTimes"] != None:
+    try:
+      with open(Files["PublishTimes"] + ".tmp", 'w') as PublishTimesFile:
+        PublishTimesFile.write(dumps(PublishTimes, indent=2))
+      os.replace(Files["PublishTimes"] + ".tmp", Files["PublishTimes"])
+    except:
+      PrintError()
 
 async def PrimaryAPICheck(Date):
   global DateOfCurrentData, LatestRecordFormatted
   WriteToMainLog("Updating primary. . .")
-  LastRecord = APIRequest("PRIMARY")
+  LastRecord = await APIRequest("PRIMARY")
+  ResponseTime = time.monotonic()
   WriteToMainLog("Primary updated.")
   Latest = False
   if LastRecord["Date"] == Date:
     WriteToMainLog("Verifying all primary metrics exist. . .")
     if VerifyDataExists("PRIMARY", LastRecord):
       WriteToMainLog("Primary verification passed.")
-      if not VerifyMassData(ReloadIfFail=False):
-        ReloadMassData(CalculateRollAvgPeak=False)
-        LatestRecordFormatted = GetAllData()[0]
-      else:
-        ParseData(LastRecord)
-      BuildDisplay(LatestRecordFormatted)
-      OldLED.off()
-      NewLED.on()
-      AddToAllData()
-      await SendData("PRIMARY", LatestRecordFormatted)
+      with TimedSpan("PrimaryPipeline"):
+        with TimedSpan("VerifyMassData"):
+          MassDataValid = await VerifyMassData(ReloadIfFail=False)
+        if not MassDataValid:
+          if not await ReloadMassData(CalculateRollAvgPeak=False):
+            raise Exception("Mass data could not be reloaded.")
+          LatestRecordFormatted = (await LoadAllData())[0]
+        else:
+          with TimedSpan("ParseData"):
+            ParseData(LastRecord)
+        with TimedSpan("BuildDisplay"):
+          BuildDisplay(LatestRecordFormatted)
+        OldLED.off()
+        NewLED.on()
+        with TimedSpan("AddToAllData"):
+          AddToAllData()
+        with TimedSpan("SendData"):
+          await SendData("PRIMARY", LatestRecordFormatted)
+      MetricGauges["publish_to_post_seconds"] = time.monotonic() - ResponseTime
       Latest = True
     else:
       WriteToMainLog("Primary verification failed.")
@@ -442,7 +843,7 @@ async def PrimaryAPICheck(Date):
 
 async def SecondaryAPICheck(Date):
   WriteToMainLog("Updating secondary. . .")
-  LastRecord = APIRequest("SECONDARY")
+  LastRecord = await APIRequest("SECONDARY")
   WriteToMainLog("Updated secondary.")
   Latest = False
   if LastRecord["Date"] == Date:
@@ -455,10 +856,10 @@ async def SecondaryAPICheck(Date):
       WriteToMainLog("Secondary verification failed.")
   return Latest
 
-def APIRequest(Structure):
+async def APIRequest(Structure):
   if Structure.upper() == "PRIMARY":
-    return PrimaryAPI.get_json()["data"][0]
-  return SecondaryAPI.get_json()["data"][0]
+    return (await RetryRequest("API", "Cov19API", PrimaryAPI.get_json, 1))["data"][0]
+  return (await RetryRequest("API", "Cov19API", SecondaryAPI.get_json, 1))["data"][0]
 
 def VerifyDataExists(Structure, Data):
   if Structure.upper() == "PRIMARY":
@@ -478,25 +879,78 @@ def VerifyDataExists(Structure, Data):
               return True
     return False
 
+# Retry Procedures
+async def RetryRequest(PolicyName, Endpoint, Request, Attempts = None, Executor = APIExecutor):
+  Policy = RetryPolicies[PolicyName]
+  if Attempts == None:
+    Attempts = Policy["Attempts"]
+  Timeout = Policy["Timeout"]
+  if Timeout == None:
+    Timeout = APITimeout
+  Attempt = 0
+  while True:
+    CheckCircuitBreaker(Endpoint)
+    try:
+      with TimedSpan("Request" + PolicyName):
+        Result = await asyncio.wait_for(RunInExecutor(Executor, Request), Timeout)
+      RecordRequestResult(Endpoint, Policy, True)
+      return Result
+    except asyncio.CancelledError:
+      raise
+    except:
+      RecordRequestResult(Endpoint, Policy, False)
+      Attempt += 1
+      if Attempts != None and Attempt >= Attempts:
+        raise
+      PrintError()
+      Delay = RetryDelay(Policy, Attempt)
+      WriteToMainLog("Request to " + Endpoint + " failed. Retrying in " + str(round(Delay, 1)) + " seconds. . .")
+      await asyncio.sleep(Delay)
+
+def RetryDelay(Policy, Attempt):
+  return min(Policy["MaxDelay"], Policy["BaseDelay"] * 2 ** (Attempt - 1)) * random.uniform(0.5, 1)
+
+def CheckCircuitBreaker(Endpoint):
+  if CircuitBreakers.__contains__(Endpoint) and GetMonotonicTime() < CircuitBreakers[Endpoint]["OpenUntil"]:
+    raise Exception("Circuit breaker open for " + Endpoint + ". Request not sent.")
+
+def RecordRequestResult(Endpoint, Policy, Success):
+  if not CircuitBreakers.__contains__(Endpoint):
+    CircuitBreakers[Endpoint] = {
+      "Failures": 0,
+      "OpenUntil": 0
+    }
+  CircuitBreaker = CircuitBreakers[Endpoint]
+  if Success:
+    if CircuitBreaker["Failures"] != 0 and Policy["FailureThreshold"] != None and CircuitBreaker["Failures"] >= Policy["FailureThreshold"]:
+      WriteToMainLog("Circuit breaker closed for " + Endpoint + ".")
+    CircuitBreaker["Failures"] = 0
+  else:
+    CircuitBreaker["Failures"] += 1
+    if Policy["FailureThreshold"] != None and CircuitBreaker["Failures"] >= Policy["FailureThreshold"]:
+      CircuitBreaker["OpenUntil"] = GetMonotonicTime() + Policy["CoolDown"]
+      WriteToMainLog("Circuit breaker opened for " + Endpoint + " for " + str(Policy["CoolDown"]) + " seconds.")
+
 # Data Store Refresh & Verification Procedures
-def VerifyMassData(ReloadIfFail = True):
+async def VerifyMassData(ReloadIfFail = True):
   WriteToMainLog("Verifying mass data store integrity. . .")
   try:
-    AllData = GetAllData()
-    DateToCheck = (date.today() - timedelta(days=1))
+    AllData = await LoadAllData()
+    DateToCheck = (GetCurrentDate() - timedelta(days=1))
     if len(AllData) == 0:
       WriteToMainLog("Mass data store data not valid.")
       if ReloadIfFail:
-        ReloadMassData()
+        await ReloadMassData()
       return False
-    for i in range(len(AllData)):
+    Dates = AllData.Column(("Date",))
+    for i in range(len(Dates)):
       while ExcludedDates.__contains__(DateToCheck):
         DateToCheck -= timedelta(days=1)
-      if AllData[i]["Date"] != DateToCheck.isoformat():
-        if i == 0 and AllData[i]["Date"] != date.today().isoformat():
+      if Dates[i] != DateToCheck.isoformat():
+        if i == 0 and Dates[i] != GetCurrentDate().isoformat():
           WriteToMainLog("Mass data store data not valid.")
           if ReloadIfFail:
-            ReloadMassData()
+            await ReloadMassData()
           return False
       else:
         DateToCheck -= timedelta(days=1)
@@ -505,88 +959,194 @@ def VerifyMassData(ReloadIfFail = True):
   except FileNotFoundError:
     WriteToMainLog("Mass data store file not found.")
     if ReloadIfFail:
-      ReloadMassData()
+      await ReloadMassData()
     return False
   except:
     PrintError()
     WriteToMainLog("Mass data store data not valid.")
     if ReloadIfFail:
-      ReloadMassData()
+      await ReloadMassData()
     return False
 
-def ReloadMassData(CalculateRollAvgPeak = True):
+async def ReloadMassData(CalculateRollAvgPeak = True, FullReload = False):
   global AllDataAPI, DataAggregationTemplate
   WriteToMainLog("Beginning mass data reload. . .")
-  WriteToMainLog("Requesting data from API. . .")
-  DataFromAPI = None
-  while DataFromAPI == None:
+  IncrementMetric("mass_data_reloads_total")
+  ReloadStart = time.monotonic()
+  if not FullReload:
+    FullReload = not await SyncMassData()
+  if FullReload:
+    WriteToMainLog("Requesting all data from API. . .")
     try:
-      DataFromAPI = AllDataAPI.get_json()["data"]
+      DataFromAPI = (await RetryRequest("API", "Cov19API", AllDataAPI.get_json))["data"]
     except:
       PrintError()
-  AllData = []
-  WriteToMainLog("Data obtained from API. Formatting mass data. . .")
-  for i in range(len(DataFromAPI)):
-    CurrentRecordFormatting = loads(dumps(DataAggregationTemplate))
-    CurrentRecordFormatting["Date"] = DataFromAPI[i]["Date"]
-    CurrentRecordFormatting["Day"] = datetime.strptime(DataFromAPI[i]["Date"], "%Y-%m-%d").weekday()
-    for Metric in Metrics:
-      CurrentRecordFormatting[Metric]["New"] = DataFromAPI[i][Metric + "New"]
-      CurrentRecordFormatting[Metric]["Total"] = DataFromAPI[i][Metric + "Total"]
-    if DataFromAPI[i]["CasesTotal"] != None and DataFromAPI[i]["DeathsTotal"] != None:
-      CurrentRecordFormatting["CaseFatality"]["Rate"] = DataFromAPI[i]["DeathsTotal"] / DataFromAPI[i]["CasesTotal"]
-    AllData.append(CurrentRecordFormatting)
-  WriteToMainLog("Mass data formatted. Calculating rolling averages & daily change. . .")
-  AllData = CalculateRollingAveragesAndDailyChange(AllData)
-  WriteToMainLog("Rolling averages & daily change calculated.")
+      WriteToMainLog("Mass data reload failed. Existing mass data kept.")
+      return False
+    WriteToMainLog("Data obtained from API. Formatting mass data. . .")
+    AllData = MassDataColumns()
+    AllData.LoadAPIRows(DataFromAPI)
+    WriteToMainLog("Mass data formatted. Calculating rolling averages & daily change. . .")
+    AllData = CalculateRollingAveragesAndDailyChange(AllData)
+    WriteToMainLog("Rolling averages & daily change calculated.")
+  else:
+    AllData = await LoadAllData()
   RollAvgPeaks = None
   if CalculateRollAvgPeak:
     WriteToMainLog("Calculating rolling average peaks. . .")
     RollAvgPeaks = CalculateRollAvgPeaks(AllData)
     WriteToMainLog("Rolling average peaks calculated.")
   WriteToMainLog("Committing to file. . .")
-  CommitToFile(AllData, RollAvgPeaks)
+  if FullReload:
+    CommitToFile(AllData, RollAvgPeaks)
+  else:
+    CommitToFile(None, RollAvgPeaks)
   WriteToMainLog("Committed to file.")
+  MetricGauges["mass_data_reload_seconds"] = time.monotonic() - ReloadStart
+  return True
 
-def CalculateRollingAveragesAndDailyChange(AllData):
-  for i in range(len(AllData)):
-    for Metric in Metrics:
-      if i <= len(AllData) - 7:
-        RollingAverageLength = "Seven"
-        RollingAverage = AllData[i][Metric]["New"]
-        for k in range(1, 7):
-          if RollingAverage != None:
-            if AllData[i + k][Metric]["New"] != None:
-              RollingAverage += AllData[i + k][Metric]["New"]
-            else:
-              RollingAverage = None
-        if RollingAverage != None:
-          RollingAverage /= 7
-          AllData[i][Metric]["RollingAverages"][RollingAverageLength]["Average"] = RollingAverage
-      if i <= len(AllData) - 3:
-        RollingAverageLength = "Three"
-        RollingAverage = AllData[i][Metric]["New"]
-        for k in range(1, 3):
-          if RollingAverage != None:
-            if AllData[i + k][Metric]["New"] != None:
-              RollingAverage += AllData[i + k][Metric]["New"]
-            else:
-              RollingAverage = None
-        if RollingAverage != None:
-          RollingAverage /= 3
-          AllData[i][Metric]["RollingAverages"][RollingAverageLength]["Average"] = RollingAverage
-      if i != 0:
-        if AllData[i - 1][Metric]["New"] != None and AllData[i][Metric]["New"] != None:
-          AllData[i - 1][Metric]["Change"] = AllData[i - 1][Metric]["New"] - AllData[i][Metric]["New"]
-          AllData[i - 1][Metric]["Corrections"] = AllData[i - 1][Metric]["Total"] - (AllData[i - 1][Metric]["New"] + AllData[i][Metric]["Total"])
-        if AllData[i - 1]["CaseFatality"]["Rate"] != None and AllData[i]["CaseFatality"]["Rate"] != None:
-          AllData[i - 1]["CaseFatality"]["Change"] = AllData[i - 1]["CaseFatality"]["Rate"] - AllData[i]["CaseFatality"]["Rate"]
-        RollingAverages = ["Three", "Seven"]
-        for RollingAverage in RollingAverages:
-          if AllData[i][Metric]["RollingAverages"][RollingAverage]["Average"] != None:
-            AllData[i - 1][Metric]["RollingAverages"][RollingAverage]["Change"] = AllData[i  -1][Metric]["RollingAverages"][RollingAverage]["Average"] - AllData[i][Metric]["RollingAverages"][RollingAverage]["Average"]
+async def SyncMassData():
+  global MassDataSupersededRecords
+  try:
+    AllData = await LoadAllData()
+  except:
+    PrintError()
+    AllData = []
+  if len(AllData) == 0:
+    WriteToMainLog("No existing mass data to update. Full reload needed.")
+    return False
+  NewestDate = datetime.strptime(AllData.GetValue(0, ("Date",)), "%Y-%m-%d").date()
+  if GetCurrentDate() - NewestDate > timedelta(days=RevisionWindow):
+    WriteToMainLog("Mass data store too far out of date to update. Full reload needed.")
+    return False
+  WriteToMainLog("Requesting newest published day from API. . .")
+  try:
+    LatestRows = (await RetryRequest("Sync", "Cov19APISync", PrimaryAPI.get_json))["data"][0:1]
+  except:
+    PrintError()
+    WriteToMainLog("Update from API failed. Full reload needed.")
+    return False
+  LastDate = GetCurrentDate()
+  if len(LatestRows) != 0:
+    LastDate = max(NewestDate, min(LastDate, datetime.strptime(LatestRows[0]["Date"], "%Y-%m-%d").date()))
+  SyncDates = []
+  DateToSync = NewestDate - timedelta(days=RevisionWindow - 1)
+  while DateToSync <= LastDate:
+    SyncDates.append(DateToSync.isoformat())
+    DateToSync += timedelta(days=1)
+  WriteToMainLog("Requesting " + str(len(SyncDates)) + " days of data from API. . .")
+  Responses = []
+  try:
+    for SyncDate in SyncDates:
+      if len(LatestRows) != 0 and LatestRows[0]["Date"] == SyncDate:
+        Responses.append({"data": LatestRows})
+      else:
+        Responses.append(await RetryRequest("Sync", "Cov19APISync", NewCov19API(Filters + ["date=" + SyncDate], PrimaryStructure).get_json))
+  except:
+    PrintError()
+    WriteToMainLog("Update from API failed. Full reload needed.")
+    return False
+  ChangedRecords = {}
+  for Response in Responses:
+    for Row in Response["data"]:
+      Index = FindMassDataIndex(Row["Date"])
+      if Index != None:
+        RecordChanged = False
+        for Metric in Metrics:
+          if AllData.GetValue(Index, (Metric, "New")) != Row[Metric + "New"] or AllData.GetValue(Index, (Metric, "Total")) != Row[Metric + "Total"]:
+            RecordChanged = True
+        if not RecordChanged:
+          continue
+        MassDataSupersededRecords += 1
+      ChangedRecords[Row["Date"]] = FormatAPIRecord(Row)
+  if len(ChangedRecords) == 0:
+    WriteToMainLog("Mass data store already up to date.")
+  else:
+    WriteToMainLog(str(len(ChangedRecords)) + " new or revised days found. Merging into mass data store. . .")
+    NumOfSyncedRecords = 0
+    while NumOfSyncedRecords < len(AllData) and AllData.GetValue(NumOfSyncedRecords, ("Date",)) >= SyncDates[0]:
+      NumOfSyncedRecords += 1
+    RecordsByDate = {}
+    for i in range(NumOfSyncedRecords):
+      RecordsByDate[AllData.GetValue(i, ("Date",))] = AllData[i]
+    RecordsByDate.update(ChangedRecords)
+    AllData[0:NumOfSyncedRecords] = [RecordsByDate[Date] for Date in sorted(RecordsByDate, reverse=True)]
+    Limit = 1
+    while Limit < len(AllData) and AllData.GetValue(Limit - 1, ("Date",)) > min(ChangedRecords):
+      Limit += 1
+    CalculateRollingAveragesAndDailyChange(AllData, Limit)
+    IndexMassData()
+    for i in range(Limit - 1, -1, -1):
+      AppendToMassData(AllData[i])
+    MassDataSupersededRecords += Limit - len(ChangedRecords)
+    if MassDataSupersededRecords > len(AllData) // 4:
+      CompactMassData()
+    else:
+      CommitLatestRecord()
+    WriteToMainLog("Mass data store updated.")
+  return await VerifyMassData(ReloadIfFail=False)
+
+def FormatAPIRecord(Data):
+  Record = NewMassDataRecord()
+  Record["Date"] = Data["Date"]
+  Record["Day"] = datetime.strptime(Data["Date"], "%Y-%m-%d").weekday()
+  for Metric in Metrics:
+    Record[Metric]["New"] = Data[Metric + "New"]
+    Record[Metric]["Total"] = Data[Metric + "Total"]
+  if Data["CasesTotal"] != None and Data["DeathsTotal"] != None:
+    Record["CaseFatality"]["Rate"] = Data["DeathsTotal"] / Data["CasesTotal"]
+  return Record
+
+def CalculateRollingAveragesAndDailyChange(AllData, Limit = None):
+  if Limit == None or Limit > len(AllData):
+    Limit = len(AllData)
+  NumOfRecords = min(len(AllData), Limit + max(RollingAverageLengths.values()))
+  Rates = AllData.Column(("CaseFatality", "Rate"), NumOfRecords)
+  for i in range(Limit):
+    Change = None
+    if i < NumOfRecords - 1 and Rates[i] != None and Rates[i + 1] != None:
+      Change = Rates[i] - Rates[i + 1]
+    AllData.SetValue(i, ("CaseFatality", "Change"), Change)
+  for Metric in Metrics:
+    New = AllData.Column((Metric, "New"), NumOfRecords)
+    Total = AllData.Column((Metric, "Total"), NumOfRecords)
+    for i in range(Limit):
+      Change = None
+      Corrections = None
+      if i < NumOfRecords - 1 and New[i] != None and New[i + 1] != None:
+        Change = New[i] - New[i + 1]
+        if Total[i] != None and Total[i + 1] != None:
+          Corrections = Total[i] - (New[i] + Total[i + 1])
+      AllData.SetValue(i, (Metric, "Change"), Change)
+      AllData.SetValue(i, (Metric, "Corrections"), Corrections)
+    for RollingAverageLength in RollingAverageLengths:
+      Averages = CalculateRollingAverageSeries(New, RollingAverageLengths[RollingAverageLength])
+      for i in range(Limit):
+        Change = None
+        if i < NumOfRecords - 1 and Averages[i] != None and Averages[i + 1] != None:
+          Change = Averages[i] - Averages[i + 1]
+        AllData.SetValue(i, (Metric, "RollingAverages", RollingAverageLength, "Average"), Averages[i])
+        AllData.SetValue(i, (Metric, "RollingAverages", RollingAverageLength, "Change"), Change)
   return AllData
 
+def CalculateRollingAverageSeries(Values, NumOfDays):
+  RunningTotals = [0]
+  RunningGaps = [0]
+  for i in range(len(Values) - 1, -1, -1):
+    if Values[i] != None:
+      RunningTotals.append(RunningTotals[-1] + Values[i])
+      RunningGaps.append(RunningGaps[-1])
+    else:
+      RunningTotals.append(RunningTotals[-1])
+      RunningGaps.append(RunningGaps[-1] + 1)
+  Averages = [None] * len(Values)
+  for i in range(len(Values) - NumOfDays + 1):
+    WindowEnd = len(Values) - i
+    WindowStart = WindowEnd - NumOfDays
+    if RunningGaps[WindowEnd] == RunningGaps[WindowStart]:
+      Averages[i] = (RunningTotals[WindowEnd] - RunningTotals[WindowStart]) / NumOfDays
+  return Averages
+
 def CalculateRollAvgPeaks(AllData):
   RollAvgPeaks = {
     "Cases": {
@@ -597,6 +1157,11 @@ def CalculateRollAvgPeaks(AllData):
       "Global": {
         "Date": None,
         "Value": None
+      },
+      "Streak": {
+        "Date": None,
+        "Positive": 0,
+        "Negative": 0
       }
     },
     "Deaths": {
@@ -607,60 +1172,92 @@ def CalculateRollAvgPeaks(AllData):
       "Global": {
         "Date": None,
         "Value": None
+      },
+      "Streak": {
+        "Date": None,
+        "Positive": 0,
+        "Negative": 0
       }
     }
   }
+  Dates = AllData.Column(("Date",))
+  Averages = {}
+  Changes = {}
+  for Metric in Metrics:
+    Averages[Metric] = AllData.Column((Metric, "RollingAverages", "Seven", "Average"))
+    Changes[Metric] = AllData.Column((Metric, "RollingAverages", "Seven", "Change"))
   for i in range(len(AllData) - 1, -1, -1):
     for Metric in Metrics:
-      RollingAverage = AllData[i][Metric]["RollingAverages"]["Seven"]["Average"]
+      RollingAverage = Averages[Metric][i]
       RollingAveragePeak = False
+      Streak = AdvanceRollAvgStreak(RollAvgPeaks[Metric]["Streak"], Dates[i], Changes[Metric][i])
       if RollingAverage != None:
         if type(RollAvgPeaks[Metric]["Global"]["Value"]) is float:
           if RollingAverage > RollAvgPeaks[Metric]["Global"]["Value"]:
-            RollAvgPeaks[Metric]["Global"]["Date"] = AllData[i]["Date"]
+            RollAvgPeaks[Metric]["Global"]["Date"] = Dates[i]
             RollAvgPeaks[Metric]["Global"]["Value"] = RollingAverage
             RollingAveragePeak = True
         else:
           RollingAveragePeak = True
-          RollAvgPeaks[Metric]["Global"]["Date"] = AllData[i]["Date"]
+          RollAvgPeaks[Metric]["Global"]["Date"] = Dates[i]
           RollAvgPeaks[Metric]["Global"]["Value"] = RollingAverage
-        if RollAvgPeaks[Metric]["Local"]["Value"] == None and AllData[i][Metric]["RollingAverages"]["Seven"]["Change"] != None:
-          if AllData[i][Metric]["RollingAverages"]["Seven"]["Change"] > 0:
-            NumPositives = 1
-            while AllData[i + NumPositives][Metric]["RollingAverages"]["Seven"]["Change"] > 0:
-              NumPositives += 1
-            if NumPositives >= 7:
+        if RollAvgPeaks[Metric]["Local"]["Value"] == None and Changes[Metric][i] != None:
+          if Changes[Metric][i] > 0:
+            if Streak["Positive"] >= 7:
               RollingAveragePeak = True
-              RollAvgPeaks[Metric]["Local"]["Date"] = AllData[i]["Date"]
+              RollAvgPeaks[Metric]["Local"]["Date"] = Dates[i]
               RollAvgPeaks[Metric]["Local"]["Value"] = RollingAverage
         if type(RollAvgPeaks[Metric]["Local"]["Value"]) is float:
           if RollingAverage > RollAvgPeaks[Metric]["Local"]["Value"]:
             RollingAveragePeak = True
-            RollAvgPeaks[Metric]["Local"]["Date"] = AllData[i]["Date"]
+            RollAvgPeaks[Metric]["Local"]["Date"] = Dates[i]
             RollAvgPeaks[Metric]["Local"]["Value"] = RollingAverage
         if not RollingAveragePeak and RollAvgPeaks[Metric]["Local"]["Date"] != None:
-          if AllData[i][Metric]["RollingAverages"]["Seven"]["Change"] < 0:
+          if Changes[Metric][i] < 0:
             DateOfLastLocal = datetime.strptime(RollAvgPeaks[Metric]["Local"]["Date"], "%Y-%m-%d")
-            DateOfCurrentData = datetime.strptime(AllData[i]["Date"], "%Y-%m-%d")
+            DateOfCurrentData = datetime.strptime(Dates[i], "%Y-%m-%d")
             if DateOfCurrentData - DateOfLastLocal >= timedelta(days=10):
-              NumNegatives = 1
-              while AllData[i + NumNegatives][Metric]["RollingAverages"]["Seven"]["Change"] < 0:
-                NumNegatives += 1
-              if NumNegatives >= 10:
+              if Streak["Negative"] >= 10:
                 RollAvgPeaks[Metric]["Local"]["Date"] = None
                 RollAvgPeaks[Metric]["Local"]["Value"] = None
   return RollAvgPeaks
 
+def AdvanceRollAvgStreak(Streak, Date, Change):
+  Streak["Date"] = Date
+  if Change != None and Change > 0:
+    Streak["Positive"] += 1
+  else:
+    Streak["Positive"] = 0
+  if Change != None and Change < 0:
+    Streak["Negative"] += 1
+  else:
+    Streak["Negative"] = 0
+  return Streak
+
+def CountRollAvgStreak(AllData, Metric, StartingIndex):
+  Streak = {
+    "Date": AllData.GetValue(StartingIndex, ("Date",)),
+    "Positive": 0,
+    "Negative": 0
+  }
+  for Change in AllData.Column((Metric, "RollingAverages", "Seven", "Change"))[StartingIndex:]:
+    if Change == None:
+      break
+    elif Change > 0 and Streak["Negative"] == 0:
+      Streak["Positive"] += 1
+    elif Change < 0 and Streak["Positive"] == 0:
+      Streak["Negative"] += 1
+    else:
+      break
+  return Streak
+
 def CommitToFile(AllData, RollAvgPeaks):
+  global AllDataStore
   if AllData != None:
+    AllDataStore = AllData
+    IndexMassData()
     WriteToMainLog("Committing mass data store to file. . .")
-    with open(Files["AllData"], 'w') as AllDataFile:
-      AllDataFile.write("[\n")
-      for i in range(len(AllData)):
-        AllDataFile.write("  " + dumps(AllData[i]))
-        if i != len(AllData) - 1:
-          AllDataFile.write(",\n")
-      AllDataFile.write("\n]")
+    CompactMassData()
     WriteToMainLog("Mass data store committed to file.")
   if RollAvgPeaks != None:
     WriteToMainLog("Committing rolling average peaks to file. . .")
@@ -672,10 +1269,372 @@ def CommitToFile(AllData, RollAvgPeaks):
     WriteToMainLog("Rolling averages peaks committed to file.")
 
 # Mass Data Handling Procedures
-def GetAllData():
+def LoadMassData():
+  global AllDataStore
+  WriteToMainLog("Loading mass data store into memory. . .")
   with open(Files["AllData"], 'r') as AllDataFile:
-    AllData = loads(AllDataFile.read())
-  return AllData
+    Contents = AllDataFile.read()
+  if len(Contents.strip()) == 0:
+    AllDataStore = MassDataColumns()
+    WriteToMainLog("Mass data store is empty.")
+    return
+  if Contents.lstrip().startswith("["):
+    ImportLegacyMassData(Contents)
+    return
+  RecordsByDate = {}
+  CompactionNeeded = False
+  Lines = Contents.split("\n")
+  if loads(Lines[0]).get("Format") != MassDataHeader["Format"]:
+    raise Exception("Mass data store file header not recognised.")
+  for i in range(1, len(Lines)):
+    if len(Lines[i].strip()) == 0:
+      continue
+    try:
+      Record = loads(Lines[i])
+    except ValueError:
+      if i < len(Lines) - 1 and len("".join(Lines[i + 1:]).strip()) != 0:
+        raise
+      WriteToMainLog("Incomplete record found at the end of the mass data store. Discarding.")
+      CompactionNeeded = True
+      continue
+    if RecordsByDate.__contains__(Record["Date"]):
+      CompactionNeeded = True
+    RecordsByDate[Record["Date"]] = Record
+  AllDataStore = MassDataColumns([RecordsByDate[Date] for Date in sorted(RecordsByDate, reverse=True)])
+  WriteToMainLog("Mass data store loaded with " + str(len(AllDataStore)) + " records.")
+  if CompactionNeeded:
+    CompactMassData()
+
+def ImportLegacyMassData(Contents):
+  global AllDataStore
+  WriteToMainLog("Mass data store is in the legacy format. Importing. . .")
+  AllDataStore = MassDataColumns(loads(Contents))
+  CompactMassData()
+  WriteToMainLog("Legacy mass data store imported with " + str(len(AllDataStore)) + " records.")
+
+def AppendToMassData(Record):
+  with open(Files["AllData"], 'a') as AllDataFile:
+    AllDataFile.write(dumps(Record) + "\n")
+    AllDataFile.flush()
+    os.fsync(AllDataFile.fileno())
+
+def CompactMassData():
+  global MassDataSupersededRecords
+  WriteToMainLog("Compacting mass data store. . .")
+  TemporaryFilename = Files["AllData"] + ".tmp"
+  with open(TemporaryFilename, 'w') as AllDataFile:
+    AllDataFile.write(dumps(MassDataHeader) + "\n")
+    for i in range(len(AllDataStore) - 1, -1, -1):
+      AllDataFile.write(dumps(AllDataStore[i]) + "\n")
+    AllDataFile.flush()
+    os.fsync(AllDataFile.fileno())
+  os.replace(TemporaryFilename, Files["AllData"])
+  MassDataSupersededRecords = 0
+  WriteToMainLog("Mass data store compacted.")
+  CommitLatestRecord()
+
+def CommitLatestRecord():
+  LatestRecordFilename = Files["AllData"] + ".latest"
+  if len(AllDataStore) == 0:
+    if os.path.isfile(LatestRecordFilename):
+      os.remove(LatestRecordFilename)
+    return
+  LatestRecord = {
+    "Format": MassDataLatestFormat,
+    "Date": AllDataStore.GetValue(0, ("Date",)),
+    "Size": os.path.getsize(Files["AllData"]),
+    "Record": AllDataStore[0]
+  }
+  TemporaryFilename = LatestRecordFilename + ".tmp"
+  with open(TemporaryFilename, 'w') as LatestRecordFile:
+    LatestRecordFile.write(dumps(LatestRecord))
+    LatestRecordFile.flush()
+    os.fsync(LatestRecordFile.fileno())
+  os.replace(TemporaryFilename, LatestRecordFilename)
+
+def ReadLatestRecord():
+  try:
+    with open(Files["AllData"] + ".latest", 'r') as LatestRecordFile:
+      LatestRecord = loads(LatestRecordFile.read())
+  except (FileNotFoundError, ValueError):
+    return None
+  if LatestRecord.get("Format") != MassDataLatestFormat or LatestRecord.get("Size") != os.path.getsize(Files["AllData"]):
+    return None
+  return LatestRecord["Record"]
+
+def GetAllData():
+  if AllDataStore == None or MassDataLoadLock.locked():
+    with MassDataLoadLock:
+      if AllDataStore == None:
+        with TimedSpan("LoadMassData"):
+          LoadMassData()
+          IndexMassData()
+  return AllDataStore
+
+async def LoadAllData():
+  if AllDataStore == None or MassDataLoadLock.locked():
+    await RunInExecutor(MassDataExecutor, GetAllData)
+  return GetAllData()
+
+async def PreloadMassData():
+  if AllDataStore != None or not os.path.isfile(Files["AllData"]):
+    return
+  WriteToMainLog("Loading mass data store in the background. . .")
+  try:
+    await RunInExecutor(MassDataExecutor, GetAllData)
+  except:
+    PrintError()
+    WriteToMainLog("Background load of the mass data store failed.")
+
+def IndexMassData():
+  global LastHighestIndex, LastHighestStack, MassDataDateIndex, MassDataDates
+  LastHighestIndex = {}
+  LastHighestStack = {}
+  MassDataDateIndex = {}
+  MassDataDates = []
+  for Metric in Metrics:
+    LastHighestIndex[Metric] = []
+    LastHighestStack[Metric] = []
+  Dates = AllDataStore.Column(("Date",))
+  New = {}
+  for Metric in Metrics:
+    New[Metric] = AllDataStore.Column((Metric, "New"))
+  for i in range(len(AllDataStore) - 1, -1, -1):
+    IndexMassDataRecord(Dates[i], {Metric: New[Metric][i] for Metric in Metrics})
+
+def IndexMassDataRecord(Date, New):
+  Row = len(MassDataDates)
+  MassDataDateIndex[Date] = Row
+  MassDataDates.append(Date)
+  for Metric in Metrics:
+    Stack = LastHighestStack[Metric]
+    LastHighestRow = None
+    if type(New[Metric]) is int:
+      while len(Stack) != 0 and Stack[-1][1] <= New[Metric]:
+        Stack.pop()
+      if len(Stack) != 0:
+        LastHighestRow = Stack[-1][0]
+      Stack.append((Row, New[Metric]))
+    LastHighestIndex[Metric].append(LastHighestRow)
+
+def FindMassDataIndex(Date):
+  AllData = GetAllData()
+  if MassDataDateIndex.__contains__(Date):
+    return len(AllData) - 1 - MassDataDateIndex[Date]
+  return None
+
+def FindMassDataRange(StartDate, EndDate):
+  AllData = GetAllData()
+  FirstRow = bisect_left(MassDataDates, StartDate)
+  LastRow = bisect_right(MassDataDates, EndDate)
+  return range(len(AllData) - 1 - FirstRow, len(AllData) - 1 - LastRow, -1)
+
+class MassDataColumns:
+  __slots__ = ("Columns", "Overflow")
+
+  def __init__(self, Records = None):
+    self.Columns = {}
+    Fields = GetMassDataFields()
+    for Path in Fields:
+      self.Columns[Path] = array(Fields[Path])
+    self.Overflow = {}
+    if Records != None:
+      self[0:0] = Records
+
+  def __len__(self):
+    return len(self.Columns[("Date",)])
+
+  def __iter__(self):
+    for i in range(len(self)):
+      yield self[i]
+
+  def __getitem__(self, Index):
+    if type(Index) is slice:
+      return [self[i] for i in range(*Index.indices(len(self)))]
+    return self.UnpackRow(self.GetRow(Index))
+
+  def __setitem__(self, Index, Records):
+    if type(Index) is not slice:
+      Index = len(self) - 1 - self.GetRow(Index)
+      Index, Records = slice(Index, Index + 1), [Records]
+    Start, Stop, Step = Index.indices(len(self))
+    if Step != 1:
+      raise ValueError("Mass data store only supports contiguous slices.")
+    Stop = max(Start, Stop)
+    Packed = [self.PackRecord(Record) for Record in reversed(list(Records))]
+    FirstRow = len(self) - Stop
+    LastRow = len(self) - Start
+    for Path in self.Columns:
+      Column = self.Columns[Path]
+      self.Columns[Path] = Column[:FirstRow] + array(Column.typecode, [Values[Path] for Values, Overflow in Packed]) + Column[LastRow:]
+    Overflow = {}
+    for Row in self.Overflow:
+      if Row < FirstRow:
+        Overflow[Row] = self.Overflow[Row]
+      elif Row >= LastRow:
+        Overflow[Row + len(Packed) - (LastRow - FirstRow)] = self.Overflow[Row]
+    for i in range(len(Packed)):
+      if Packed[i][1] != None:
+        Overflow[FirstRow + i] = Packed[i][1]
+    self.Overflow = Overflow
+
+  def insert(self, Index, Record):
+    self[Index:Index] = [Record]
+
+  def LoadAPIRows(self, Rows):
+    Values = {Path: [] for Path in self.Columns}
+    Missing = {Path: PackMassDataValue(Path, None) for Path in self.Columns}
+    self.Overflow = {}
+    for Row, Data in enumerate(reversed(Rows)):
+      Packed = {}
+      try:
+        Packed[("Date",)] = PackMassDataValue(("Date",), Data["Date"])
+        Packed[("Day",)] = date.fromordinal(Packed[("Date",)]).weekday()
+        for Metric in Metrics:
+          Packed[(Metric, "New")] = PackMassDataValue((Metric, "New"), Data[Metric + "New"])
+          Packed[(Metric, "Total")] = PackMassDataValue((Metric, "Total"), Data[Metric + "Total"])
+        if Data["CasesTotal"] != None and Data["DeathsTotal"] != None:
+          Packed[("CaseFatality", "Rate")] = PackMassDataValue(("CaseFatality", "Rate"), Data["DeathsTotal"] / Data["CasesTotal"])
+      except ValueError:
+        Packed = {}
+        self.Overflow[Row] = FormatAPIRecord(Data)
+      for Path in Values:
+        Values[Path].append(Packed.get(Path, Missing[Path]))
+    for Path in Values:
+      self.Columns[Path] = array(self.Columns[Path].typecode, Values[Path])
+
+  def GetRow(self, Index):
+    if Index < 0:
+      Index += len(self)
+    if Index < 0 or Index >= len(self):
+      raise IndexError("Mass data store index out of range.")
+    return len(self) - 1 - Index
+
+  def PackRecord(self, Record):
+    Leaves = FlattenMassDataRecord(Record)
+    if list(Leaves) == [Path for Path in self.Columns if Leaves.__contains__(Path)]:
+      try:
+        return {Path: PackMassDataValue(Path, Leaves.get(Path)) for Path in self.Columns}, None
+      except ValueError:
+        pass
+    return {Path: PackMassDataValue(Path, None) for Path in self.Columns}, loads(dumps(Record))
+
+  def UnpackRow(self, Row):
+    if self.Overflow.__contains__(Row):
+      return loads(dumps(self.Overflow[Row]))
+    Record = {}
+    for Path in self.Columns:
+      Parent = Record
+      for Key in Path[:-1]:
+        Parent = Parent.setdefault(Key, {})
+      Parent[Path[-1]] = UnpackMassDataValue(Path, self.Columns[Path][Row])
+    return Record
+
+  def GetValue(self, Index, Path):
+    return self.GetRowValue(self.GetRow(Index), Path)
+
+  def GetRowValue(self, Row, Path):
+    if self.Overflow.__contains__(Row):
+      Value = self.Overflow[Row]
+      for Key in Path:
+        if type(Value) is not dict:
+          return None
+        Value = Value.get(Key)
+      return Value
+    if not self.Columns.__contains__(Path):
+      return None
+    return UnpackMassDataValue(Path, self.Columns[Path][Row])
+
+  def SetValue(self, Index, Path, Value):
+    Row = self.GetRow(Index)
+    if not self.Overflow.__contains__(Row):
+      try:
+        self.Columns[Path][Row] = PackMassDataValue(Path, Value)
+        return
+      except (KeyError, ValueError):
+        self.Overflow[Row] = self.UnpackRow(Row)
+        for ColumnPath in self.Columns:
+          self.Columns[ColumnPath][Row] = PackMassDataValue(ColumnPath, None)
+    Parent = self.Overflow[Row]
+    for Key in Path[:-1]:
+      Parent = Parent.setdefault(Key, {})
+    Parent[Path[-1]] = Value
+
+  def Column(self, Path, Count = None):
+    if Count == None or Count > len(self):
+      Count = len(self)
+    if not self.Columns.__contains__(Path):
+      return [self.GetRowValue(Row, Path) for Row in range(len(self) - 1, len(self) - 1 - Count, -1)]
+    Values = self.Columns[Path][len(self) - Count:].tolist()[::-1]
+    if MassDataFields[Path] == "d":
+      Values = [None if Value != Value else Value for Value in Values]
+    elif Path == ("Date",):
+      Values = [None if Value == MassDataMissingInt else date.fromordinal(Value).isoformat() for Value in Values]
+    else:
+      Values = [None if Value == MassDataMissingInt else Value for Value in Values]
+    for Row in self.Overflow:
+      if Row >= len(self) - Count:
+        Values[len(self) - 1 - Row] = self.GetRowValue(Row, Path)
+    return Values
+
+def NewMassDataRecord(Template = None):
+  if Template == None:
+    Template = DataAggregationTemplate
+  Record = {}
+  for Key in Template:
+    if type(Template[Key]) is dict:
+      Record[Key] = NewMassDataRecord(Template[Key])
+    else:
+      Record[Key] = Template[Key]
+  return Record
+
+def GetMassDataFields():
+  global MassDataFields
+  if MassDataFields == None:
+    MassDataFields = {}
+    for Path in FlattenMassDataRecord(DataAggregationTemplate):
+      if Path[0] == "CaseFatality" or Path.__contains__("RollingAverages"):
+        MassDataFields[Path] = "d"
+      else:
+        MassDataFields[Path] = "q"
+  return MassDataFields
+
+def FlattenMassDataRecord(Record, Path = (), Leaves = None):
+  if Leaves == None:
+    Leaves = {}
+  for Key in Record:
+    if type(Record[Key]) is dict:
+      FlattenMassDataRecord(Record[Key], Path + (Key,), Leaves)
+    else:
+      Leaves[Path + (Key,)] = Record[Key]
+  return Leaves
+
+def PackMassDataValue(Path, Value):
+  if MassDataFields[Path] == "d":
+    if Value == None:
+      return MassDataMissingFloat
+    if type(Value) is float and Value == Value:
+      return Value
+  elif Value == None:
+    return MassDataMissingInt
+  elif Path == ("Date",):
+    if type(Value) is str:
+      Ordinal = datetime.strptime(Value, "%Y-%m-%d").date().toordinal()
+      if date.fromordinal(Ordinal).isoformat() == Value:
+        return Ordinal
+  elif type(Value) is int and MassDataMissingInt < Value < -MassDataMissingInt:
+    return Value
+  raise ValueError("Value cannot be stored in mass data column " + "/".join(Path) + ".")
+
+def UnpackMassDataValue(Path, Value):
+  if MassDataFields[Path] == "d":
+    if Value != Value:
+      return None
+  elif Value == MassDataMissingInt:
+    return None
+  elif Path == ("Date",):
+    return date.fromordinal(Value).isoformat()
+  return Value
 
 def ParseData(Data):
   global LatestRecordFormatted
@@ -687,57 +1646,55 @@ def ParseData(Data):
     LatestRecordFormatted[Metric]["New"] = Data[Metric + "New"]
     LatestRecordFormatted[Metric]["Total"] = Data[Metric + "Total"]
     LatestRecordFormatted["CaseFatality"]["Rate"] = Data["DeathsTotal"] / Data["CasesTotal"]
-    if AllData[0]["CaseFatality"]["Rate"] != None:
-      LatestRecordFormatted["CaseFatality"]["Change"] = LatestRecordFormatted["CaseFatality"]["Rate"] - AllData[0]["CaseFatality"]["Rate"]
-    if AllData[0][Metric]["New"] != None:
-      LatestRecordFormatted[Metric]["Change"] = Data[Metric + "New"] - AllData[0][Metric]["New"]
-      if AllData[0][Metric]["Total"] != None:
-        LatestRecordFormatted[Metric]["Corrections"] = Data[Metric + "Total"] - (Data[Metric + "New"] + AllData[0][Metric]["Total"])
+    if AllData.GetValue(0, ("CaseFatality", "Rate")) != None:
+      LatestRecordFormatted["CaseFatality"]["Change"] = LatestRecordFormatted["CaseFatality"]["Rate"] - AllData.GetValue(0, ("CaseFatality", "Rate"))
+    if AllData.GetValue(0, (Metric, "New")) != None:
+      LatestRecordFormatted[Metric]["Change"] = Data[Metric + "New"] - AllData.GetValue(0, (Metric, "New"))
+      if AllData.GetValue(0, (Metric, "Total")) != None:
+        LatestRecordFormatted[Metric]["Corrections"] = Data[Metric + "Total"] - (Data[Metric + "New"] + AllData.GetValue(0, (Metric, "Total")))
   WriteToMainLog("Parsing complete.")
-  CalculateRollingAverages(3, AllData, Data)
-  CalculateRollingAverages(7, AllData, Data)
+  for RollingAverageLength in RollingAverageLengths:
+    CalculateRollingAverages(RollingAverageLength, AllData, Data)
 
-def CalculateRollingAverages(NumOfDays, AllData, NewData):
+def CalculateRollingAverages(RollingAverageLength, AllData, NewData):
   global LatestRecordFormatted
+  NumOfDays = RollingAverageLengths[RollingAverageLength]
   WriteToMainLog("Calculating rolling averages of length " + str(NumOfDays) + ". . .")
-  if NumOfDays == 3:
-    RollingAverageLength = "Three"
-  else:
-    RollingAverageLength = "Seven"
   for Metric in Metrics:
     RollingAverage = NewData[Metric + "New"]
-    for i in range(NumOfDays - 1):
+    if len(AllData) < NumOfDays - 1:
+      RollingAverage = None
+    for i in range(min(NumOfDays - 1, len(AllData))):
       if RollingAverage != None:
-        if AllData[i][Metric]["New"] != None:
-          RollingAverage += AllData[i][Metric]["New"]
+        if AllData.GetValue(i, (Metric, "New")) != None:
+          RollingAverage += AllData.GetValue(i, (Metric, "New"))
         else:
           RollingAverage = None
     if RollingAverage != None:
       RollingAverage /= NumOfDays
-      LatestRecordFormatted[Metric]["RollingAverages"][RollingAverageLength]["Average"] = RollingAverage
-      if AllData[0][Metric]["RollingAverages"][RollingAverageLength]["Average"] != None:
-        LatestRecordFormatted[Metric]["RollingAverages"][RollingAverageLength]["Change"] = RollingAverage - AllData[0][Metric]["RollingAverages"][RollingAverageLength]["Average"]
+      LatestRecord = LatestRecordFormatted[Metric]["RollingAverages"].setdefault(RollingAverageLength, {"Average": None, "Change": None})
+      LatestRecord["Average"] = RollingAverage
+      PreviousAverage = AllData.GetValue(0, (Metric, "RollingAverages", RollingAverageLength, "Average"))
+      if PreviousAverage != None:
+        LatestRecord["Change"] = RollingAverage - PreviousAverage
   WriteToMainLog("Specified rolling average calculated.")
 
 def AddToAllData():
   global LatestRecordFormatted
   ExistingData = GetAllData()
   WriteToMainLog("Adding to mass data. . .")
-  if ExistingData[0]["Date"] == LatestRecordFormatted["Date"]:
+  if ExistingData.GetValue(0, ("Date",)) == LatestRecordFormatted["Date"]:
     WriteToMainLog("Latest data already exists in file.")
   else:
-    with open(Files["AllData"], 'w') as AllDataFile:
-      AllDataFile.write("[\n")
-      Output = "  " + dumps(LatestRecordFormatted)
-      for Data in ExistingData:
-        Output += ",\n  " + dumps(Data)
-      AllDataFile.write(Output)
-      AllDataFile.write("\n]")
+    ExistingData.insert(0, LatestRecordFormatted)
+    IndexMassDataRecord(LatestRecordFormatted["Date"], {Metric: LatestRecordFormatted[Metric]["New"] for Metric in Metrics})
+    AppendToMassData(ExistingData[0])
+    CommitLatestRecord()
   WriteToMainLog("Data added to mass data store.")
 
 async def CheckRollAvgPeaks():
   Output = []
-  if not VerifyMassData(ReloadIfFail=False):
+  if not await VerifyMassData(ReloadIfFail=False):
     WriteToMainLog("Main data store not valid. Peaks not calculated.")
     await SendNotification("An error occurred and the peaks could not be calculated. Please pester the bot admin for an explanation.")
   else:
@@ -776,8 +1733,9 @@ async def CheckRollAvgPeaks():
         "ExpiredLocal": "Local %DEATHSPLACEHOLDER% peak expired."
       }
     }
-    with open(Files["RollAvgPeaks"]) as RollAvgPeaksFile:
-      CurrentPeaks = loads(RollAvgPeaksFile.read())
+    with TimedSpan("ReadRollAvgPeaks"):
+      with open(Files["RollAvgPeaks"]) as RollAvgPeaksFile:
+        CurrentPeaks = loads(RollAvgPeaksFile.read())
     for Metric in Metrics:
       RollAvgPeaks[Metric] = LookForPeak(Metric.upper(), RollAvgPeaks[Metric], CurrentPeaks)
       if RollAvgPeaks[Metric]["NewGlobal"]:
@@ -787,7 +1745,7 @@ async def CheckRollAvgPeaks():
       if RollAvgPeaks[Metric]["NewLocal"]:
         if RollAvgPeaks[Metric]["CreatedLocal"]:
           Output.append(MessagesTemplate[Metric]["CreatedLocal"])
-        Output.append(MessagesTemplate[Metric]["NewLocal"])
+        Output.append(MessagesTemplate[Metric]["PeakLocal"])
       if RollAvgPeaks[Metric]["ExpiredLocal"]:
         Output.append(MessagesTemplate[Metric]["ExpiredLocal"])
     if len(Output) != 0:
@@ -795,9 +1753,9 @@ async def CheckRollAvgPeaks():
       for Line in Output:
         FinalOutput += Line.replace("%CASESPLACEHOLDER%", CasesRAPlaceholder).replace("%DEATHSPLACEHOLDER%", DeathsRAPlaceholder) + "\n"
       await SendNotification(FinalOutput)
-      CommitPeaksToFile(RollAvgPeaks, CurrentPeaks)
     else:
       await SendNotification("No peaks today.")
+    CommitPeaksToFile(RollAvgPeaks, CurrentPeaks)
     WriteToMainLog("Rolling average peaks checked.")
 
 def LookForPeak(Metric, Flags, CurrentPeaks):
@@ -809,13 +1767,10 @@ def LookForPeak(Metric, Flags, CurrentPeaks):
   else:
     Flags["CreatedGlobal"] = True
     Flags["NewGlobal"] = True
+  Streak = GetRollAvgStreak(Metric, CurrentPeaks)
   if CurrentPeaks[Metric]["Local"]["Value"] == None:
     if LatestRecordFormatted[Metric]["RollingAverages"]["Seven"]["Change"] > 0:
-      AllData = GetAllData()
-      NumPositives = 1
-      while AllData[NumPositives][Metric]["RollingAverages"]["Seven"]["Change"] > 0:
-        NumPositives += 1
-      if NumPositives >= 7:
+      if Streak["Positive"] >= 7:
         Flags["CreatedLocal"] = True
         Flags["NewLocal"] = True
   if type(CurrentPeaks[Metric]["Local"]["Value"]) is float:
@@ -826,15 +1781,31 @@ def LookForPeak(Metric, Flags, CurrentPeaks):
       DateOfLastLocal = datetime.strptime(CurrentPeaks[Metric]["Local"]["Date"], "%Y-%m-%d")
       CurrentDate = datetime.strptime(LatestRecordFormatted["Date"], "%Y-%m-%d")
       if CurrentDate - DateOfLastLocal >= timedelta(days=10):
-        AllData = GetAllData()
-        NumNegatives = 1
-        while AllData[NumNegatives][Metric]["RollingAverages"]["Seven"]["Change"] < 0:
-          NumNegatives += 1
-        if NumNegatives >= 10:
+        if Streak["Negative"] >= 10:
           Flags["ExpiredLocal"] = True
+  CurrentPeaks[Metric]["Streak"] = Streak
   WriteToMainLog("Checking complete for metric " + Metric + ".")
   return Flags
 
+def GetRollAvgStreak(Metric, CurrentPeaks):
+  Streak = None
+  if CurrentPeaks[Metric].__contains__("Streak"):
+    Streak = CurrentPeaks[Metric]["Streak"]
+    if Streak["Date"] == LatestRecordFormatted["Date"]:
+      return Streak
+  AllData = GetAllData()
+  if Streak == None or len(AllData) < 2 or Streak["Date"] != AllData.GetValue(1, ("Date",)):
+    WriteToMainLog("Rolling average streak for metric " + Metric + " out of date. Counting from mass data. . .")
+    if len(AllData) < 2:
+      Streak = {
+        "Date": None,
+        "Positive": 0,
+        "Negative": 0
+      }
+    else:
+      Streak = CountRollAvgStreak(AllData, Metric, 1)
+  return AdvanceRollAvgStreak(dict(Streak), LatestRecordFormatted["Date"], LatestRecordFormatted[Metric]["RollingAverages"]["Seven"]["Change"])
+
 def CommitPeaksToFile(Flags, CurrentPeaks):
   WriteToMainLog("Checking if Rolling Average Peaks file needs recommitting. . .")
   ChangesMade = True
@@ -858,12 +1829,16 @@ def CommitPeaksToFile(Flags, CurrentPeaks):
 def FindLastHighest(AllData, CheckData, Metric, StartingIndex = 0):
   LastHighestDate = "#N/A; all time highest"
   Metric = Metric[0].upper() + Metric[1:len(Metric)].lower()
-  if type(CheckData[Metric]["New"]) is int:
+  if type(CheckData[Metric]["New"]) is int and AllData is AllDataStore and StartingIndex < len(AllData) and AllData.GetValue(StartingIndex, ("Date",)) == CheckData["Date"] and AllData.GetValue(StartingIndex, (Metric, "New")) == CheckData[Metric]["New"]:
+    LastHighestRow = LastHighestIndex[Metric][len(AllData) - 1 - StartingIndex]
+    if LastHighestRow != None:
+      LastHighestDate = MassDataDates[LastHighestRow] + "; {:,}".format(AllData.GetValue(len(AllData) - 1 - LastHighestRow, (Metric, "New")))
+  elif type(CheckData[Metric]["New"]) is int:
     for i in range(StartingIndex, len(AllData)):
-      CurrentIndex = AllData[i]
-      if type(CurrentIndex[Metric]["New"]) is int:
-        if CurrentIndex[Metric]["New"] > CheckData[Metric]["New"]:
-          LastHighestDate = CurrentIndex["Date"] + "; {:,}".format(CurrentIndex[Metric]["New"])
+      New = AllData.GetValue(i, (Metric, "New"))
+      if type(New) is int:
+        if New > CheckData[Metric]["New"]:
+          LastHighestDate = AllData.GetValue(i, ("Date",)) + "; {:,}".format(New)
           break
   else:
     LastHighestDate = "None"
@@ -932,20 +1907,65 @@ def BuildDisplay(Data):
   CurrentDisplay = NewDisplay[0:4]
 
 def CommitDisplay(NewDisplay):
-  WriteToMainLog("Reloading display. . .")
+  IncrementMetric("display_commits_total")
+  DisplayExecutor.submit(WriteDisplay, NewDisplay[0:4])
+
+def DisplayString(Text, Line):
+  DisplayExecutor.submit(RunDisplayWrite, partial(WriteDisplayLine, Text, Line - 1))
+
+def ClearDisplay():
+  DisplayExecutor.submit(RunDisplayWrite, ClearDisplayBuffer)
+
+def RunDisplayWrite(Write):
+  try:
+    Write()
+  except:
+    PrintError()
+
+def WriteDisplay(NewDisplay):
+  try:
+    WriteToMainLog("Reloading display. . .")
+    with TimedSpan("CommitDisplay"):
+      for i in range(len(NewDisplay)):
+        WriteDisplayLine(NewDisplay[i], i)
+    WriteToMainLog("Display reloaded.")
+  except:
+    PrintError()
+
+def WriteDisplayLine(Text, Line):
+  if DisplayBuffer == None:
+    ClearDisplayBuffer()
+  Text = Text[0:DisplayWidth].ljust(DisplayWidth)
+  Changed = [i for i in range(DisplayWidth) if Text[i] != DisplayBuffer[Line][i]]
+  i = 0
+  while i < len(Changed):
+    Start = Changed[i]
+    while i + 1 < len(Changed) and Changed[i + 1] - Changed[i] <= 2:
+      i += 1
+    Display.lcd_write(0x80 + DisplayLineOffsets[Line] + Start)
+    for Character in Text[Start:Changed[i] + 1]:
+      Display.lcd_write(ord(Character), DisplayRegisterSelect)
+    i += 1
+  DisplayBuffer[Line] = Text
+
+def ClearDisplayBuffer():
+  global DisplayBuffer
   Display.lcd_clear()
-  for i in range(len(NewDisplay)):
-    Display.lcd_display_string(NewDisplay[i], i + 1)
-  WriteToMainLog("Display reloaded.")
+  DisplayBuffer = [" " * DisplayWidth for _ in DisplayLineOffsets]
 
 # Discord Procedures
 @DiscordClient.event
 async def on_ready():
+  global StartupTime
   WriteToMainLog("Discord bot ready as: {0.user}".format(DiscordClient))
+  if StartupTime != None:
+    RecordStartupTiming("StartupToReady", time.monotonic() - StartupTime)
+    StartupTime = None
+  DiscordClient.loop.create_task(PreloadMassData())
 
 async def WaitForDiscord():
   global ErrorMode
-  SuccessfulWait = False
+  SuccessfulWait = Simulated
   try:
     while not SuccessfulWait:
       WriteToMainLog("Waiting for discord bot to be ready. . .")
@@ -956,6 +1976,15 @@ async def WaitForDiscord():
     PrintError()
     await asyncio.sleep(DelayTime)
 
+def GetChannel():
+  if Simulated:
+    return SimulationChannel
+  return DiscordClient.get_channel(id=ChannelID)
+
+async def SetPresence(Status):
+  if not Simulated:
+    await DiscordClient.change_presence(status=Status)
+
 async def SendData(Structure, Data, Index = 0):
   await WaitForDiscord()
   WriteToMainLog("Building Discord message for " + Structure.lower() + " structure. . .")
@@ -978,13 +2007,9 @@ async def SendData(Structure, Data, Index = 0):
   NumDecimalPointForRounding = 3
   Output = "```\n"
   if Structure == "PRIMARY":
-    ShowLastHighest = VerifyMassData(ReloadIfFail=False)
+    ShowLastHighest = await VerifyMassData(ReloadIfFail=False)
     if ShowLastHighest:
-      AllData = GetAllData()
-    RollingAverages = [
-      "Three,3",
-      "Seven,7"
-    ]
+      AllData = await LoadAllData()
     Output += "PRIMARY DATA FOR " + Data["Date"] + ", " + Weekdays[Data["Day"]]
     for Metric in Metrics:
       Output += "\n" + Emoji[Metric] + Metric + ":"
@@ -1000,16 +2025,16 @@ async def SendData(Structure, Data, Index = 0):
         Output += "\n    Last Highest: " + FindLastHighest(AllData, Data, Metric, Index)
       else:
         Output += "\n    Last Highest: None"
-      for RollingAverage in RollingAverages:
-        AverageWord = RollingAverage.split(',')[0]
-        AverageNumber = RollingAverage.split(',')[1]
+      for AverageWord in RollingAverageLengths:
+        AverageNumber = str(RollingAverageLengths[AverageWord])
         Output += "\n    Roll Avg (" + AverageNumber + "-Day):"
-        if type(Data[Metric]["RollingAverages"][AverageWord]["Average"]) is float:
-          Output += "\n      Average:    {:,}".format(round(Data[Metric]["RollingAverages"][AverageWord]["Average"], NumDecimalPointForRounding))
+        RollingAverage = Data[Metric]["RollingAverages"].get(AverageWord, {"Average": None, "Change": None})
+        if type(RollingAverage["Average"]) is float:
+          Output += "\n      Average:    {:,}".format(round(RollingAverage["Average"], NumDecimalPointForRounding))
         else:
           Output += "\n      Average:    None"
-        if type(Data[Metric]["RollingAverages"][AverageWord]["Change"]) is float:
-          Output += "\n      Change:     {:,}".format(round(Data[Metric]["RollingAverages"][AverageWord]["Change"], NumDecimalPointForRounding)) + GetArrow(Data[Metric]["RollingAverages"][AverageWord]["Change"])
+        if type(RollingAverage["Change"]) is float:
+          Output += "\n      Change:     {:,}".format(round(RollingAverage["Change"], NumDecimalPointForRounding)) + GetArrow(RollingAverage["Change"])
         else:
           Output += "\n      Change:     None" + Emoji["Cross"]
       if type(Data[Metric]["Corrections"]) is int:
@@ -1063,17 +2088,22 @@ async def SendData(Structure, Data, Index = 0):
 @DiscordClient.event
 async def SendNotification(Notification):
   await WaitForDiscord()
-  Channel = DiscordClient.get_channel(id=ChannelID)
-  await Channel.send(Notification)
+  Channel = GetChannel()
+  with TimedSpan("SendNotification"):
+    await Channel.send(Notification)
+  IncrementMetric("discord_notifications_total")
 
 # Discord Commands
 @DiscordClient.event
 async def on_message(Message):
   try:
-    if Message.channel == DiscordClient.get_channel(id=ChannelID) and len(Message.content) > 0:
+    if Message.channel == GetChannel() and len(Message.content) > 0:
       if Message.content[0] == "$":
         Command = Message.content
-        if Command.upper().startswith("$GETDATA"):
+        if Command.upper().startswith("$BLOCKING"):
+          WriteToMainLog("Command received of type \"BLOCKING\".")
+          await BlockingCommand()
+        elif Command.upper().startswith("$GETDATA"):
           WriteToMainLog("Command received of type: \"GETDATA\".")
           await GetDataCommand(Command.split(' '))
         elif Command.upper().startswith("$MESSAGES"):
@@ -1082,6 +2112,9 @@ async def on_message(Message):
         elif Command.upper().startswith("$RAVGPEAKS"):
           WriteToMainLog("Command received of type \"RAVGPEAKS\".")
           await RollAvgPeaksCommand(Command.split(' '))
+        elif Command.upper().startswith("$STATS"):
+          WriteToMainLog("Command received of type \"STATS\".")
+          await StatsCommand(Command.split(' '))
         elif Command.upper().startswith("$VARIANT"):
           WriteToMainLog("Command received of type \"VARIANT\".")
           if VariantsEnable:
@@ -1106,32 +2139,57 @@ async def on_message_edit(BeforeMessage, AfterMessage):
   if BeforeMessage.content != AfterMessage.content:
     await on_message(AfterMessage)
 
+async def BlockingCommand():
+  if BlockingThreshold == None:
+    await SendNotification("`$blocking` command is only available when the bot admin has set a blocking threshold.")
+  elif len(BlockingReports) == 0:
+    await SendNotification("No calls have held up the bot for longer than " + str(BlockingThreshold) + " seconds.")
+  else:
+    await SendNotification("```\n" + BuildBlockingReport() + "\n```")
+
 async def GetDataCommand(Command):
-  VerifyMassData()
-  AllData = GetAllData()
+  await VerifyMassData()
+  AllData = await LoadAllData()
   if len(AllData) == 0:
     await SendNotification("No data to send.")
   else:
     if len(Command) == 2:
       if VerifyDate(Command[1]):
         WriteToMainLog("Data requested for " + Command[1] + ". Obtaining data. . .")
-        DataFound = False
-        for i in range(len(AllData)):
-          if AllData[i]["Date"] == Command[1]:
-            DataFound = True
-            WriteToMainLog("Data found.")
-            await SendData("PRIMARY", AllData[i], i)
-            break
-        if not DataFound:
+        Index = FindMassDataIndex(VerifyDate(Command[1]).date().isoformat())
+        if Index != None:
+          WriteToMainLog("Data found.")
+          await SendData("PRIMARY", AllData[Index], Index)
+        else:
           WriteToMainLog("Data not found.")
           await SendNotification("No data was found for this date.")
       else:
         await SendNotification("`$getdata` command supports date only in ISO 8601 format (YYYY-MM-DD). Omit for the latest data.")
+    elif len(Command) == 3:
+      StartDate = VerifyDate(Command[1])
+      EndDate = VerifyDate(Command[2])
+      if StartDate and EndDate:
+        if StartDate > EndDate:
+          await SendNotification("`$getdata` command requires the first date to be no later than the second date.")
+        elif EndDate - StartDate >= timedelta(days=GetDataRangeLimit):
+          await SendNotification("`$getdata` command supports ranges of up to " + str(GetDataRangeLimit) + " days.")
+        else:
+          WriteToMainLog("Data requested from " + Command[1] + " to " + Command[2] + ". Obtaining data. . .")
+          Indexes = FindMassDataRange(StartDate.date().isoformat(), EndDate.date().isoformat())
+          if len(Indexes) != 0:
+            WriteToMainLog(str(len(Indexes)) + " records found.")
+            for Index in Indexes:
+              await SendData("PRIMARY", AllData[Index], Index)
+          else:
+            WriteToMainLog("Data not found.")
+            await SendNotification("No data was found for this date range.")
+      else:
+        await SendNotification("`$getdata` command supports dates only in ISO 8601 format (YYYY-MM-DD).")
     elif len(Command) == 1:
       WriteToMainLog("Latest data requested.")
       await SendData("PRIMARY", AllData[0], 0)
     else:
-      await SendNotification("`$getdata` command takes zero or one argument of type *date*.")
+      await SendNotification("`$getdata` command takes zero, one, or two arguments of type *date*.")
 
 async def MessagesCommand():
   ExistingMessages = await ResendMessages()
@@ -1171,6 +2229,28 @@ async def RollAvgPeaksCommand(Command):
   await SendNotification(Output)
   WriteToMainLog("Peaks obtained and message sent.")
 
+async def StatsCommand(Command):
+  if len(Command) == 1:
+    StatsDate = GetCurrentDate().isoformat()
+  elif len(Command) == 2 and VerifyDate(Command[1]):
+    StatsDate = VerifyDate(Command[1]).date().isoformat()
+  else:
+    await SendNotification("`$stats` command takes zero or one argument of type *date* in ISO 8601 format (YYYY-MM-DD).")
+    return
+  Timings = GetTimings(StatsDate)
+  if len(Timings) == 0:
+    await SendNotification("No timings found for " + StatsDate + ".")
+    return
+  Output = "```\nTimings for " + StatsDate + " (ms):\n" + "Stage".ljust(20) + "Count".rjust(7) + "p50".rjust(10) + "p90".rjust(10) + "p99".rjust(10) + "Max".rjust(10)
+  for Name in sorted(Timings):
+    Durations = sorted(Timings[Name])
+    Output += "\n" + Name[0:20].ljust(20) + str(len(Durations)).rjust(7)
+    for Percent in [50, 90, 99]:
+      Output += str(round(Percentile(Durations, Percent), 1)).rjust(10)
+    Output += str(round(Durations[-1], 1)).rjust(10)
+  Output += "\n```"
+  await SendNotification(Output)
+
 async def VariantCommand(Command):
   try:
     Output = ""
@@ -1216,8 +2296,10 @@ async def VariantCommand(Command):
               if i != len(Command) - 1:
                 Nation += " "
           else:
+            import flag
             Nation = flag.dflagize(Command[2]).replace(':', '')
           if Nation.upper() != "UN":
+            from iso3166 import countries
             Nation = countries.get(Nation).alpha2
           for Variant in VariantsList:
             if len(Variant) > 1:
@@ -1317,7 +2399,13 @@ async def VersionCommand():
     "04. Configuration:",
     "  A. Replaced discord.txt and hard coded variable values for one config.json file.",
     "  B. Added a function that would allow the replacement of some configuration values without the need for a restart.",
-    "05. COVID Pi: Moved display building into new function.",
+    "05. COVID Pi:",
+    "  A. Moved display building into new function.",
+    "  B. The display is no longer cleared on every update. Only the characters that have changed are written, in the background, so the display does not flicker and the bot does not wait on it.",
+    "  C. On startup the display is painted from a snapshot of the latest day kept next to the mass data store, and the full store is loaded in the background once the bot has connected to Discord.",
+    "  D. The display, LEDs and API connections are now set up when the script starts rather than when it is loaded, and the country and flag lookups used by the variants command are only loaded when first needed. The time taken to load the script, to restore the display, and to connect to Discord are logged and shown in $stats.",
+    "  E. Added a simulation mode, started with --simulate, that replaces the display, LEDs, Discord and the API with stand-ins so the bot can be run and timed on any computer. Its files are kept in a separate folder, set with --simulate-dir, so the real mass data store and logs are never changed.",
+    "  F. Added a replay mode, started with --replay followed by a start date and a number of days alongside --simulate, that runs the bot on a virtual clock so whole days of polling, posting and status message checks take seconds, and reports when data was found, how long posting took and how many requests were made on each day.",
     "06. Discord Commands:",
     "  A. Split each command into its own function.",
     "  B. Replaced help output string with list.",
@@ -1325,17 +2413,35 @@ async def VersionCommand():
     "    I. Removed references to the \"latest\" parameter in one of the error messages.",
     "    II. Corrected error message that stated the command takes exactly one argument and included the type of parameter.",
     "    III. Using the command will force a verification of the data store.",
+    "    IV. Added an optional second date to return every day in a range of up to 31 days.",
+    "    V. Dates are now looked up through an index kept with the mass data store.",
     "  D. RAVGPeaks:",
     "    I. Moved building output message to new function and utilised recursion.",
     "    II. Added message in help clarifying that one parameter must be included when another is used.",
     "    III. Amended the wording of the error messages to be more descriptive.",
-    "  E: Version: Added a flag that would prevent the script from crashing due to this changelog being too fucking big.",
-    "07. Logs: Removed runtime logs where text is \"Done.\".",
+    "  E. Stats: Added command that shows how long each stage of the daily update, API requests, file reads, display writes and Discord messages took on a given day. Each timing is also written to the optional Timings file as JSON Lines.",
+    "  F: Version: Added a flag that would prevent the script from crashing due to this changelog being too fucking big.",
+    "07. Logs:",
+    "  A. Removed runtime logs where text is \"Done.\".",
+    "  B. Log lines are now written to the runtime log in the background every few seconds rather than opening the file for every line. Errors are still written straight away, and old log files can be compressed with CompressLogs.",
+    "  C. Added an optional metrics endpoint in the Prometheus text format on MetricsPort, reporting API polls, request and stage timings, publish-to-post delay, banner cache use, event loop lag, Discord messages, mass data reloads, store size, and memory use.",
+    "  D. Added an optional debug mode, enabled with BlockingThreshold, that logs the stack of any call holding up the bot for longer than the threshold along with whether it came from a command, the scheduler or the API check, and ranks them in the $blocking command.",
     "08. Mass Data:",
     "  A. Added the ability for the script to verify the mass data and to refresh the data at regular intervals or when invalid.",
     "  B. Added a check that would prevent rolling averages, corrections, and daily change from being calculated if the data was invalid.",
     "  C. Working on cutting back code duplication.",
-    "09. Primary: Fixed a bug that would cause the script to crash if the corrections number could not be calculated.",
+    "  D. The mass data store is now loaded into memory once and updated in place, rather than reading the file for every use.",
+    "  E. The mass data store file is now an append-only log, with each new day appended rather than the whole file rewritten. Files in the previous layout are imported automatically.",
+    "  F. Rolling averages and daily change are now calculated one metric at a time using running totals, and rolling averages of any length can be added to RollingAverageLengths.",
+    "  G. The previous highest day for each metric is now indexed when the mass data store is loaded or added to, rather than searched for on every report.",
+    "  H. Refreshing the mass data now only requests the days after the newest stored record plus a revision window from the API, one day at a time and only up to the newest published day, with its own retry limits so a failed refresh does not hold up the daily search. It falls back to requesting all data if the result is still invalid.",
+    "  I. The mass data store is now held in memory as one compact column per value rather than a set of nested entries per day, taking about 0.16 MB rather than 2.3 MB for 1,000 days, and is converted back to the same layout for the file and Discord messages. A full reload fills the columns straight from the API data.",
+    "09. Primary:",
+    "  A. Fixed a bug that would cause the script to crash if the corrections number could not be calculated.",
+    "  B. Requests to the API now run in the background with a timeout, so the bot keeps responding to Discord while waiting for data.",
+    "  C. Primary and secondary data are now requested at the same time rather than one after the other.",
+    "  D. Failed requests to the API are retried with an increasing, randomised delay, and requests are paused for a while after repeated failures rather than retried continuously.",
+    "  E. The API is polled less often before and after the time data is usually published, based on the times data was found on previous days.",
     "10. Primary & Secondary Data Outputs:",
     "  A. Removed the datestamp.",
     "  B. Removed code duplication.",
@@ -1344,6 +2450,8 @@ async def VersionCommand():
     "  B. Removed link between global and local rolling average peaks. A global peak no longer implicitly creates a local peak.",
     "  C. Replaced the Rolling Average placeholder text to be more descriptive.",
     "  D. Removed code duplication.",
+    "  E. Peaks are now found in a single pass over the data, and the current run of rising or falling averages is saved to the peaks file so the daily check does not need to count back through the mass data.",
+    "  F. Fixed a bug that stopped the daily peak check with an error whenever a new local peak was found.",
     "12. Secondary: Added dictionary for total doses that adds numbers during the existing loop.",
     "13. Sending of Discord Messages: Unified sending of messages around one method.",
     "14. Status Messages:",
@@ -1351,10 +2459,17 @@ async def VersionCommand():
     "  B. Moved reading of the Messages.json file into new function.",
     "  C. Added text in the sent message that indicates the origin of the message.",
     "  D. Fixed a bug that would cause the script to enter an infinite loop if the contents of Messages.json was invalid upon a check.",
+    "  E. Banner messages are requested with a timeout and a limited number of retries, and an unavailable address is skipped rather than retried until it responds.",
+    "  F. All banner addresses are now requested at the same time in the background over one kept-alive connection, so checking for messages no longer holds up Discord commands.",
+    "  G. Banner responses are cached for BannerCacheTTL seconds and then requested again only if they have changed on the server. Messages that have not changed since they were last checked that day are not checked again.",
+    "  H. The Messages.json file is now kept in memory with an index by date and message, and is only read again when it has been changed. New messages are added to the end of the file instead of the whole file being rewritten, and messages older than MessagesRetentionDays can be moved to an archive file.",
     "15. Supplementary Files: Removed all functions of LastOutput.txt and Discord.txt.",
     "16. Time Check:",
     "  A. Fixed a bug that would prevent the timeout message from sending if one set of data was obtained, but not the other.",
     "  B. Fixed a bug that would prevent the script from preparing for a new day if that date was excluded.",
+    "  C. Replaced the time loop that checked the time every 5 seconds with a scheduler that sleeps until the next job is due. The next run of each job is written to the log, and jobs are rescheduled if the system clock changes.",
+    "  D. Fixed a bug that would cause the script to crash when sending the timeout message.",
+    "  E. Fixed a bug that would prevent data being searched for the next day if only the secondary data was obtained.",
     "17. Variants:",
     "  A. Removed the number field and selection by number.",
     "  B. Added more checks to ensure the script cannot crash due to exceeding the Discord character limit.",
@@ -1375,10 +2490,14 @@ async def VersionCommand():
 async def CommandHelp():
   Help = [
     "Command syntax:",
-    "  $getdata [date]: Returns the primary data for the date specified.",
+    "  $blocking: Lists the calls that held up the bot the longest. Only available when BlockingThreshold is set.",
+    "  $getdata [date] [enddate]: Returns the primary data for the date or range of dates specified.",
     "    date: A date given in ISO 8601 form (YYYY-MM-DD). Omit for the latest data.",
+    "    enddate: The last date of a range of up to " + str(GetDataRangeLimit) + " days, given in ISO 8601 form (YYYY-MM-DD). Omit for a single date.",
     "  $messages: Outputs any messages for the current day.",
     "  $ravgpeaks: Displays the latest rolling average peaks. Refer to $ravgpeaks help.",
+    "  $stats [date]: Shows how long each stage of the bot took on the date specified, in milliseconds.",
+    "    date: A date given in ISO 8601 form (YYYY-MM-DD). Omit for the current day.",
     "  $variant: Returns variant information based on details specified. Refer to $variant help.",
     "  $version: Shows current bot version and changelog from previous version."
   ]
@@ -1401,26 +2520,139 @@ def VariantDetails(VariantData):
       Output += ","
   Output += "\nVariant of: " + VariantData["Variant of"]
   Output += "\nEarliest Sample: " + VariantData["Earliest Sample"]
+  import flag
   Output += "\nAssociated Nation: " + flag.flag(VariantData["Nation"])
   if VariantData["Nation"].upper() == "UN":
     Output += " Multiple Countries"
   else:
+    from iso3166 import countries
     Output += " " + countries.get(VariantData["Nation"]).name
   return Output
 
 # Status Messages
-def ReadMessagesFile():
-  with open(Files["Messages"], 'r') as MessagesFile:
-    ExistingMessages = loads(MessagesFile.read())
+def ReadMessagesFile(Path = None):
+  if Path == None:
+    Path = Files["Messages"]
+  if not os.path.isfile(Path):
+    return []
+  with TimedSpan("ReadMessagesFile"):
+    with open(Path, 'r') as MessagesFile:
+      ExistingMessages = loads(MessagesFile.read())
   return ExistingMessages
 
+def GetMessagesFileState():
+  if not os.path.isfile(Files["Messages"]):
+    return None
+  FileStats = os.stat(Files["Messages"])
+  return (FileStats.st_mtime_ns, FileStats.st_size)
+
+def GetMessages():
+  global MessagesFileState, MessagesStore
+  FileState = GetMessagesFileState()
+  if MessagesStore == None or FileState != MessagesFileState:
+    WriteToMainLog("Loading messages file. . .")
+    MessagesStore = ReadMessagesFile()
+    MessagesFileState = FileState
+    IndexMessages()
+    WriteToMainLog("Messages file loaded.")
+  return MessagesStore
+
+def IndexMessages():
+  global MessagesDateIndex, MessagesIndex
+  MessagesIndex = {}
+  MessagesDateIndex = {}
+  for i in range(len(MessagesStore)):
+    IndexMessage(i)
+
+def IndexMessage(Position):
+  Message = MessagesStore[Position]
+  Key = GetMessageKey(Message["Message"], Message["Date"])
+  if not MessagesIndex.__contains__(Key):
+    MessagesIndex[Key] = Position
+  if not MessagesDateIndex.__contains__(Message["Date"]):
+    MessagesDateIndex[Message["Date"]] = []
+  MessagesDateIndex[Message["Date"]].append(Position)
+
+def GetMessageKey(Message, MessageDate):
+  return (MessageDate, sha1(Message.encode("utf-8")).hexdigest())
+
+def GetMessagesForDate(MessageDate):
+  Messages = GetMessages()
+  if not MessagesDateIndex.__contains__(MessageDate):
+    return []
+  return [Messages[Position] for Position in MessagesDateIndex[MessageDate]]
+
+def AddToMessages(Message):
+  global MessagesFileState
+  Messages = GetMessages()
+  Messages.append(Message)
+  IndexMessage(len(Messages) - 1)
+  AppendToMessagesFile(Files["Messages"], [Message])
+  MessagesFileState = GetMessagesFileState()
+
+def CommitMessages():
+  global MessagesFileState
+  WriteMessagesFile(Files["Messages"], GetMessages())
+  MessagesFileState = GetMessagesFileState()
+
+def WriteMessagesFile(Path, Messages):
+  with open(Path + ".tmp", 'w') as MessagesFile:
+    MessagesFile.write("[\n")
+    for i in range(len(Messages)):
+      MessagesFile.write("  " + dumps(Messages[i]))
+      if i < len(Messages) - 1:
+        MessagesFile.write(",\n")
+    MessagesFile.write("\n]")
+  os.replace(Path + ".tmp", Path)
+
+def AppendToMessagesFile(Path, Messages):
+  if not os.path.isfile(Path):
+    WriteMessagesFile(Path, Messages)
+    return
+  with open(Path, 'rb+') as MessagesFile:
+    MessagesFile.seek(0, os.SEEK_END)
+    TailStart = max(0, MessagesFile.tell() - 1024)
+    MessagesFile.seek(TailStart)
+    Tail = MessagesFile.read().rstrip()
+    Contents = None
+    if Tail.endswith(b"]"):
+      Contents = Tail[:-1].rstrip()
+    if Contents != None and (len(Contents) > 0 or TailStart == 0):
+      MessagesFile.seek(TailStart + len(Contents))
+      Separator = b",\n  "
+      if Contents.endswith(b"["):
+        Separator = b"\n  "
+      for Message in Messages:
+        MessagesFile.write(Separator + dumps(Message).encode("utf-8"))
+        Separator = b",\n  "
+      MessagesFile.write(b"\n]")
+      MessagesFile.truncate()
+      return
+  WriteToMainLog("End of messages file not recognised. Rewriting messages file. . .")
+  WriteMessagesFile(Path, ReadMessagesFile(Path) + Messages)
+
+def PruneMessages():
+  global MessagesStore
+  if MessagesRetentionDays == None:
+    return
+  Messages = GetMessages()
+  OldestDate = (GetCurrentDate() - timedelta(days=MessagesRetentionDays)).isoformat()
+  ExpiredMessages = [Message for Message in Messages if Message["Date"] < OldestDate]
+  if len(ExpiredMessages) == 0:
+    return
+  WriteToMainLog("Archiving " + str(len(ExpiredMessages)) + " messages older than " + str(MessagesRetentionDays) + " days. . .")
+  AppendToMessagesFile(os.path.splitext(Files["Messages"])[0] + ".archive.json", ExpiredMessages)
+  MessagesStore = [Message for Message in Messages if Message["Date"] >= OldestDate]
+  IndexMessages()
+  CommitMessages()
+  WriteToMainLog("Messages archived.")
+
 async def ResendMessages():
   WriteToMainLog("Resending existing messages . . .")
-  Messages = ReadMessagesFile()
-  CurrentDate = date.today().isoformat()
+  CurrentDate = GetCurrentDate().isoformat()
   MessageSent = False
-  for Message in Messages:
-    if Message["Date"] == CurrentDate and Message["Sent"]:
+  for Message in GetMessagesForDate(CurrentDate):
+    if Message["Sent"]:
       if Message["Type"] == "AdminMessages":
         MessageOrigin = "Bot Admin"
       elif Message["Type"] == "LogBannersMessages" or Message["Type"] == "Metric":
@@ -1433,94 +2665,149 @@ async def ResendMessages():
     WriteToMainLog("No existing messages found.")
   return MessageSent
 
+async def FetchBanners(Addresses, CurrentDate):
+  Results = await asyncio.gather(*[FetchBanner(Address, CurrentDate) for Address in Addresses])
+  Banners = []
+  FetchedAddresses = []
+  for i in range(len(Addresses)):
+    if Results[i] == None:
+      Banners.append([])
+    else:
+      Banners.append(Results[i])
+      FetchedAddresses.append(Addresses[i])
+  WriteToMainLog("Banner cache: " + str(BannerCacheStats["Hits"]) + " hits, " + str(BannerCacheStats["Misses"]) + " misses, " + str(BannerCacheStats["NotModified"]) + " not modified.")
+  return Banners, FetchedAddresses
+
+async def FetchBanner(Address, CurrentDate):
+  if Address == None:
+    return []
+  CacheEntry = None
+  if BannerCache.__contains__(Address):
+    CacheEntry = BannerCache[Address]
+  if CacheEntry != None and GetMonotonicTime() - CacheEntry["Fetched"] < BannerCacheTTL:
+    BannerCacheStats["Hits"] += 1
+    Unchanged = True
+  else:
+    Headers = {}
+    if CacheEntry != None:
+      if CacheEntry["ETag"] != None:
+        Headers["If-None-Match"] = CacheEntry["ETag"]
+      if CacheEntry["LastModified"] != None:
+        Headers["If-Modified-Since"] = CacheEntry["LastModified"]
+    try:
+      Response = await RetryRequest("Banners", Address, partial(RequestBanner, Address, Headers), Executor=BannerExecutor)
+    except:
+      PrintError()
+      WriteToMainLog("Messages could not be obtained from " + Address + ".")
+      return None
+    if Response == None and CacheEntry != None:
+      BannerCacheStats["NotModified"] += 1
+      CacheEntry["Fetched"] = GetMonotonicTime()
+      Unchanged = True
+    else:
+      BannerCacheStats["Misses"] += 1
+      Response["Fetched"] = GetMonotonicTime()
+      Response["Processed"] = None
+      if CacheEntry != None and CacheEntry["Messages"] == Response["Messages"]:
+        Response["Processed"] = CacheEntry["Processed"]
+      CacheEntry = Response
+      BannerCache[Address] = CacheEntry
+      Unchanged = False
+  if Unchanged and CacheEntry["Processed"] == CurrentDate:
+    return []
+  return CacheEntry["Messages"]
+
+def RequestBanner(Address, Headers):
+  Response = BannerSession.get(ResolveAddress(Address, "banners"), headers=Headers, timeout=RetryPolicies["Banners"]["Timeout"])
+  if Response.status_code == 304:
+    return None
+  Response.raise_for_status()
+  return {
+    "Messages": loads(Response.text),
+    "ETag": Response.headers.get("ETag"),
+    "LastModified": Response.headers.get("Last-Modified")
+  }
+
+def MarkBannersProcessed(Addresses, CurrentDate):
+  for Address in Addresses:
+    if BannerCache.__contains__(Address):
+      BannerCache[Address]["Processed"] = CurrentDate
+
 async def CheckForMessage(CurrentDate = None):
   try:
     if CurrentDate == None:
-      CurrentDate = date.today().isoformat()
+      CurrentDate = GetCurrentDate().isoformat()
+    IncrementMetric("message_checks_total")
     NewMessages = False
     SuccessfulCheck = False
-    ExistingMessages = ReadMessagesFile()
     while not SuccessfulCheck:
       try:
         WriteToMainLog("Checking for administrative messages. . .")
-        ExistingMessages = ReadMessagesFile()
-        for Message in ExistingMessages:
-          if Message["Type"] == "AdminMessages" and Message["Date"] == CurrentDate:
-            if not MessageAlreadySent(Message["Message"], ExistingMessages, Message["Date"]):
+        AdminMessagesSent = False
+        for Message in GetMessagesForDate(CurrentDate):
+          if Message["Type"] == "AdminMessages":
+            if not MessageAlreadySent(Message["Message"], Message["Date"]):
               NewMessages = True
               await SendMessage(CurrentDate, Message["Message"], "Bot Admin")
               Message["Sent"] = True
+              AdminMessagesSent = True
+        if AdminMessagesSent:
+          WriteToMainLog("Updating messages file. . .")
+          CommitMessages()
+          WriteToMainLog("Messages file updated.")
         SuccessfulCheck = True
       except:
         PrintError()
         await asyncio.sleep(DelayTime)
     WriteToMainLog("Administrative messages check completed.")
-    SuccessfulCheck = False
-    while not SuccessfulCheck:
-      try:
-        WriteToMainLog("Checking for log banner (blue) messages. . .")
-        for Address in StatusMessagesAddresses["BlueBannersAddresses"]:
-          Address = Address.replace("%DATE%", CurrentDate)
-          Messages = loads(requests.get(Address).text)
-          for Message in Messages:
-            if Message["date"] == CurrentDate:
-              if ["UPDATE", "DATA ISSUE", "CHANGE TO METRIC"].__contains__(Message["type"].upper()):
-                if not MessageAlreadySent(Message["body"], ExistingMessages, Message["date"]):
-                  await SendMessage(CurrentDate, Message["body"], "Dashboard")
-                  NewMessages = True
-                  ExistingMessages.append(
-                    {
-                      "Date": CurrentDate,
-                      "Message": Message["body"],
-                      "Type": "LogBannersMessages",
-                      "Sent": True
-                    }
-                  )
-        SuccessfulCheck = True
-      except:
-        PrintError()
-    WriteToMainLog("Log banner messages check completed.")
-    SuccessfulCheck = False
-    while not SuccessfulCheck:
-      try:
-        WriteToMainLog("Checking for announcement (yellow) messages. . .")
-        Messages = loads(requests.get(StatusMessagesAddresses["YellowBannersAddress"]).text)
-        for Message in Messages:
-          if Message["date"] == CurrentDate:
-            if not MessageAlreadySent(Message["body"], ExistingMessages, Message["date"]):
+    WriteToMainLog("Requesting log banner (blue) and announcement (yellow) messages. . .")
+    BannersAddresses = [Address.replace("%DATE%", CurrentDate) for Address in StatusMessagesAddresses["BlueBannersAddresses"]] + [StatusMessagesAddresses["YellowBannersAddress"]]
+    Banners, FetchedAddresses = await FetchBanners(BannersAddresses, CurrentDate)
+    WriteToMainLog("Checking for log banner (blue) messages. . .")
+    for Messages in Banners[:-1]:
+      for Message in Messages:
+        if Message["date"] == CurrentDate:
+          if ["UPDATE", "DATA ISSUE", "CHANGE TO METRIC"].__contains__(Message["type"].upper()):
+            if not MessageAlreadySent(Message["body"], Message["date"]):
               await SendMessage(CurrentDate, Message["body"], "Dashboard")
+              IncrementMetric("messages_sent_total")
               NewMessages = True
-              ExistingMessages.append(
+              AddToMessages(
                 {
                   "Date": CurrentDate,
-                    "Message": Message["body"],
-                    "Type": "Metric",
-                    "Sent": True
+                  "Message": Message["body"],
+                  "Type": "LogBannersMessages",
+                  "Sent": True
                 }
               )
-        SuccessfulCheck = True
-      except:
-        PrintError()
+    WriteToMainLog("Log banner messages check completed.")
+    WriteToMainLog("Checking for announcement (yellow) messages. . .")
+    for Message in Banners[-1]:
+      if Message["date"] == CurrentDate:
+        if not MessageAlreadySent(Message["body"], Message["date"]):
+          await SendMessage(CurrentDate, Message["body"], "Dashboard")
+          IncrementMetric("messages_sent_total")
+          NewMessages = True
+          AddToMessages(
+            {
+              "Date": CurrentDate,
+              "Message": Message["body"],
+              "Type": "Metric",
+              "Sent": True
+            }
+          )
     WriteToMainLog("Announcement messages check completed.")
-    if NewMessages:
-      WriteToMainLog("Updating messages file. . .")
-      with open(Files["Messages"], 'w') as MessagesFile:
-        MessagesFile.write("[\n")
-        for i in range(len(ExistingMessages)):
-          MessagesFile.write("  " + dumps(ExistingMessages[i]))
-          if i < len(ExistingMessages) - 1:
-            MessagesFile.write(",\n")
-        MessagesFile.write("\n]")
-      WriteToMainLog("Messages file updated.")
+    MarkBannersProcessed(FetchedAddresses, CurrentDate)
   except:
     PrintError()
     return False
   return NewMessages
 
-def MessageAlreadySent(Message, ExistingMessages, MessageDate):
-  for ExistingMessage in ExistingMessages:
-    if Message == ExistingMessage["Message"] and ExistingMessage["Date"] == MessageDate:
-      return ExistingMessage["Sent"]
+def MessageAlreadySent(Message, MessageDate):
+  Messages = GetMessages()
+  Key = GetMessageKey(Message, MessageDate)
+  if MessagesIndex.__contains__(Key):
+    return Messages[MessagesIndex[Key]]["Sent"]
   return False
 
 async def SendMessage(Date, Message, MessageOrigin):
@@ -1536,28 +2823,277 @@ async def SendMessage(Date, Message, MessageOrigin):
     Output += "\n> " + Paragraph
   await SendNotification(Output)
 
+# Metrics Procedures
+def IncrementMetric(Name, Amount = 1):
+  if not MetricCounters.__contains__(Name):
+    MetricCounters[Name] = 0
+  MetricCounters[Name] += Amount
+
+async def StartMetricsServer():
+  global MetricsServer
+  if MetricsPort == None or MetricsServer != None:
+    return
+  try:
+    MetricsServer = await asyncio.start_server(HandleMetricsRequest, port=MetricsPort)
+    WriteToMainLog("Metrics available on port " + str(MetricsPort) + ".")
+    if not Replaying:
+      await MonitorLoopLag()
+  except:
+    PrintError()
+
+async def MonitorLoopLag():
+  MetricGauges["event_loop_lag_max_seconds"] = 0
+  while True:
+    Start = time.monotonic()
+    await asyncio.sleep(LoopLagInterval)
+    Lag = max(0, time.monotonic() - Start - LoopLagInterval)
+    MetricGauges["event_loop_lag_seconds"] = Lag
+    MetricGauges["event_loop_lag_max_seconds"] = max(MetricGauges["event_loop_lag_max_seconds"], Lag)
+
+async def HandleMetricsRequest(Reader, Writer):
+  try:
+    RequestLine = (await asyncio.wait_for(Reader.readline(), 10)).decode("latin-1").split(" ")
+    while (await asyncio.wait_for(Reader.readline(), 10)) not in [b"\r\n", b"\n", b""]:
+      continue
+    if len(RequestLine) > 1 and RequestLine[1].split("?")[0] in ["/", "/metrics"]:
+      Status = "200 OK"
+      Body = BuildMetrics()
+    else:
+      Status = "404 Not Found"
+      Body = "Not found.\n"
+    Body = Body.encode("utf-8")
+    Writer.write(("HTTP/1.1 " + Status + "\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: " + str(len(Body)) + "\r\nConnection: close\r\n\r\n").encode("latin-1") + Body)
+    await Writer.drain()
+  except:
+    PrintError()
+  Writer.close()
+
+def BuildMetrics():
+  Gauges = dict(MetricGauges)
+  if AllDataStore != None:
+    Gauges["mass_data_records"] = len(AllDataStore)
+  if Files["AllData"] != None and os.path.isfile(Files["AllData"]):
+    Gauges["mass_data_file_bytes"] = os.path.getsize(Files["AllData"])
+  if os.path.isfile("/proc/self/statm"):
+    with open("/proc/self/statm") as StatusFile:
+      Gauges["memory_rss_bytes"] = int(StatusFile.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  Counters = dict(MetricCounters)
+  Counters["banner_cache_hits_total"] = BannerCacheStats["Hits"]
+  Counters["banner_cache_misses_total"] = BannerCacheStats["Misses"]
+  Counters["banner_cache_not_modified_total"] = BannerCacheStats["NotModified"]
+  Output = []
+  for Name in sorted(Counters):
+    Output.append("# TYPE ukcovid19_" + Name + " counter")
+    Output.append("ukcovid19_" + Name + " " + str(Counters[Name]))
+  for Name in sorted(Gauges):
+    Output.append("# TYPE ukcovid19_" + Name + " gauge")
+    Output.append("ukcovid19_" + Name + " " + str(Gauges[Name]))
+  Output.append("# TYPE ukcovid19_stage_duration_seconds summary")
+  with TimingLock:
+    Totals = {Name: dict(TimingTotals[Name]) for Name in TimingTotals}
+  for Name in sorted(Totals):
+    Output.append("ukcovid19_stage_duration_seconds_count{stage=\"" + Name + "\"} " + str(Totals[Name]["Count"]))
+    Output.append("ukcovid19_stage_duration_seconds_sum{stage=\"" + Name + "\"} " + str(Totals[Name]["Sum"]))
+  return "\n".join(Output) + "\n"
+
+# Debug Procedures
+async def StartBlockingDetector():
+  global LoopHeartbeat, LoopThread
+  if BlockingThreshold == None or Replaying:
+    return
+  WriteToMainLog("Debug mode enabled. Watching for calls that block for longer than " + str(BlockingThreshold) + " seconds.")
+  LoopThread = threading.get_ident()
+  LoopHeartbeat = time.monotonic()
+  threading.Thread(target=WatchEventLoop, name="BlockingDetector", daemon=True).start()
+  while True:
+    LoopHeartbeat = time.monotonic()
+    await asyncio.sleep(BlockingCheckInterval)
+    Lag = time.monotonic() - LoopHeartbeat - BlockingCheckInterval
+    if Lag > BlockingThreshold:
+      RecordBlockingCall(Lag)
+
+def WatchEventLoop():
+  global BlockingStack
+  while True:
+    time.sleep(BlockingThreshold / 2)
+    if BlockingStack == None and time.monotonic() - LoopHeartbeat > BlockingThreshold + BlockingCheckInterval:
+      Frame = sys._current_frames().get(LoopThread)
+      if Frame != None:
+        BlockingStack = traceback.extract_stack(Frame)
+
+def RecordBlockingCall(Lag):
+  global BlockingStack
+  Stack = BlockingStack
+  BlockingStack = None
+  Origin = "Other"
+  Location = "Unknown"
+  StackText = "Stack not captured.\n"
+  if Stack != None:
+    for Entry in Stack:
+      if BlockingOrigins.__contains__(Entry.name):
+        Origin = BlockingOrigins[Entry.name]
+      if Entry.filename == __file__:
+        Location = Entry.name + ":" + str(Entry.lineno)
+    StackText = "".join(traceback.format_list(Stack))
+  Key = Origin + " " + Location
+  if not BlockingReports.__contains__(Key):
+    BlockingReports[Key] = {
+      "Count": 0,
+      "Total": 0,
+      "Max": 0
+    }
+  BlockingReports[Key]["Count"] += 1
+  BlockingReports[Key]["Total"] += Lag
+  BlockingReports[Key]["Max"] = max(BlockingReports[Key]["Max"], Lag)
+  WriteToMainLog("Event loop blocked for " + str(round(Lag, 3)) + " seconds from " + Origin + " at " + Location + " {\n" + StackText + "}")
+
+def BuildBlockingReport():
+  Output = "Origin".ljust(12) + "Location".ljust(28) + "Count".rjust(6) + "Total (s)".rjust(11) + "Max (s)".rjust(9)
+  for Key in sorted(BlockingReports, key=lambda Key: BlockingReports[Key]["Total"], reverse=True)[0:15]:
+    Origin, Location = Key.split(" ", 1)
+    Output += "\n" + Origin.ljust(12) + Location[0:27].ljust(28) + str(BlockingReports[Key]["Count"]).rjust(6) + str(round(BlockingReports[Key]["Total"], 2)).rjust(11) + str(round(BlockingReports[Key]["Max"], 2)).rjust(9)
+  return Output
+
 # Log Procedures
 def WriteToMainLog(Text, Date = True):
   if Date:
-    Output = "[" + datetime.now().astimezone().replace(microsecond=0).isoformat(sep='T') + "] " + Text + "\n"
+    Output = "[" + GetCurrentTime().astimezone().replace(microsecond=0).isoformat(sep='T') + "] " + Text + "\n"
   else:
     Output = Text + "\n"
-  with open(Files["RuntimeLogs"].replace("%DATE%", date.today().isoformat()), 'a') as LogFile:
-    LogFile.write(Output)
+  QueueLogLine(Output)
 
 def PrintError():
-  with open(Files["RuntimeLogs"].replace("%DATE%", date.today().isoformat()),'a') as LogFile:
-    LogFile.write("["+datetime.now().astimezone().replace(microsecond=0).isoformat(sep='T')+"] Critical Error {\n")
-    LogFile.write(traceback.format_exc())
-    LogFile.write("\n}\n")
+  QueueLogLine("[" + GetCurrentTime().astimezone().replace(microsecond=0).isoformat(sep='T') + "] Critical Error {\n" + traceback.format_exc() + "\n}\n")
+  FlushLogs()
+
+def QueueLogLine(Output, LogFilename = None):
+  global LogWriter
+  if LogFilename == None:
+    LogFilename = Files["RuntimeLogs"]
+  with LogLock:
+    LogQueue.append((LogFilename.replace("%DATE%", GetCurrentDate().isoformat()), Output))
+    QueueFull = len(LogQueue) >= LogQueueLength
+    if LogWriter == None:
+      LogWriter = threading.Thread(target=RunLogWriter, name="LogWriter", daemon=True)
+      LogWriter.start()
+  if QueueFull:
+    FlushLogs()
+
+def RunLogWriter():
+  global LogCompressionPending
+  while True:
+    time.sleep(LogFlushInterval)
+    FlushLogs()
+    if LogCompressionPending:
+      LogCompressionPending = False
+      if CompressLogs:
+        try:
+          CompressOldLogs()
+        except:
+          traceback.print_exc()
+
+def FlushLogs():
+  global LastLogFilename, LogCompressionPending
+  with LogFlushLock:
+    with LogLock:
+      Lines = list(LogQueue)
+      LogQueue.clear()
+    i = 0
+    while i < len(Lines):
+      LogFilename = Lines[i][0]
+      Output = []
+      while i < len(Lines) and Lines[i][0] == LogFilename:
+        Output.append(Lines[i][1])
+        i += 1
+      try:
+        with open(LogFilename, 'a') as LogFile:
+          LogFile.write("".join(Output))
+        if LogFilename != LastLogFilename and LogFilename.startswith(Files["RuntimeLogs"].split("%DATE%")[0]):
+          LastLogFilename = LogFilename
+          LogCompressionPending = True
+      except:
+        traceback.print_exc()
+
+def CompressOldLogs():
+  if not Files["RuntimeLogs"].__contains__("%DATE%"):
+    return
+  LogsFolder = os.path.dirname(Files["RuntimeLogs"])
+  Prefix, Suffix = os.path.basename(Files["RuntimeLogs"]).split("%DATE%", 1)
+  CurrentLogFilename = os.path.basename(Files["RuntimeLogs"].replace("%DATE%", GetCurrentDate().isoformat()))
+  for LogFilename in os.listdir(LogsFolder or "."):
+    if LogFilename.startswith(Prefix) and LogFilename.endswith(Suffix) and not LogFilename.endswith(".gz") and LogFilename != CurrentLogFilename:
+      LogFilename = os.path.join(LogsFolder, LogFilename)
+      with open(LogFilename, 'rb') as LogFile:
+        with gzip.open(LogFilename + ".gz", 'ab') as CompressedLogFile:
+          shutil.copyfileobj(LogFile, CompressedLogFile)
+      os.remove(LogFilename)
+
+@contextmanager
+def TimedSpan(Name):
+  Start = time.perf_counter()
+  Success = False
+  try:
+    yield
+    Success = True
+  finally:
+    RecordTiming(Name, (time.perf_counter() - Start) * 1000, Success)
+
+def RecordTiming(Name, Duration, Success = True):
+  CurrentDate = GetCurrentDate().isoformat()
+  with TimingLock:
+    if not TimingStats.__contains__(CurrentDate):
+      for OldDate in sorted(TimingStats)[:-TimingStatsDays + 1]:
+        del TimingStats[OldDate]
+      TimingStats[CurrentDate] = {}
+    if not TimingStats[CurrentDate].__contains__(Name):
+      TimingStats[CurrentDate][Name] = []
+    TimingStats[CurrentDate][Name].append(Duration)
+    if not TimingTotals.__contains__(Name):
+      TimingTotals[Name] = {
+        "Count": 0,
+        "Sum": 0
+      }
+    TimingTotals[Name]["Count"] += 1
+    TimingTotals[Name]["Sum"] += Duration / 1000
+  if Files["Timings"] != None:
+    Record = {
+      "Time": GetCurrentTime().astimezone().isoformat(sep='T'),
+      "Name": Name,
+      "Duration": round(Duration, 3),
+      "Success": Success
+    }
+    QueueLogLine(dumps(Record) + "\n", Files["Timings"])
+
+def GetTimings(Date):
+  with TimingLock:
+    if TimingStats.__contains__(Date):
+      return {Name: list(TimingStats[Date][Name]) for Name in TimingStats[Date]}
+  Timings = {}
+  if Files["Timings"] != None and os.path.isfile(Files["Timings"].replace("%DATE%", Date)):
+    with open(Files["Timings"].replace("%DATE%", Date)) as TimingsFile:
+      for Line in TimingsFile:
+        if Line.strip() == "":
+          continue
+        Record = loads(Line)
+        if Record["Time"].startswith(Date):
+          if not Timings.__contains__(Record["Name"]):
+            Timings[Record["Name"]] = []
+          Timings[Record["Name"]].append(Record["Duration"])
+  return Timings
+
+def Percentile(SortedValues, Percent):
+  return SortedValues[max(0, -(-len(SortedValues) * Percent // 100) - 1)]
+
+atexit.register(FlushLogs)
 
 async def FatalException(WriteToFile = True):
+  FlushLogs()
   ErrorLED.on()
   OldLED.off()
   NewLED.off()
-  Display.lcd_clear()
-  Display.lcd_display_string("WARNING!".center(20),1)
-  Display.lcd_display_string("The script has quit.",2)
+  ClearDisplay()
+  DisplayString("WARNING!".center(20), 1)
+  DisplayString("The script has quit.", 2)
   if WriteToFile:
     ErrorLogFilename = Files["ErrorLogs"] + "Error_" + datetime.now().strftime("%Y-%m-%dT%H%M%S") + ".txt"
     with open(ErrorLogFilename,'a') as ErrorFile:
@@ -1565,37 +3101,317 @@ async def FatalException(WriteToFile = True):
       ErrorFile.write(traceback.format_exc())
       ErrorFile.write("\n}\n")
   else:
-    Display.lcd_display_string("File not written.".center(20),4)
+    DisplayString("File not written.".center(20), 4)
   while True:
     ErrorLED.off()
     await asyncio.sleep(0.9)
     ErrorLED.on()
     await asyncio.sleep(0.1)
 
+# Clock Procedures
+def GetCurrentTime():
+  if Replaying:
+    return datetime.fromtimestamp(ReplayEpoch + ReplayClock)
+  return datetime.now()
+
+def GetCurrentDate():
+  return GetCurrentTime().date()
+
+def GetMonotonicTime():
+  if Replaying:
+    return ReplayClock
+  return time.monotonic()
+
+def PauseFor(Seconds):
+  global ReplayClock
+  if Replaying:
+    ReplayClock += Seconds
+  else:
+    time.sleep(Seconds)
+
+async def RunInExecutor(Executor, Function):
+  global ReplayBusy
+  ReplayBusy += 1
+  try:
+    return await asyncio.get_event_loop().run_in_executor(Executor, Function)
+  finally:
+    ReplayBusy -= 1
+
+# Simulation Procedures
+class VirtualDisplay:
+  __slots__ = ("Address", "Lines", "Writes")
+  Rs = 0b00000001
+
+  def __init__(self):
+    self.Writes = 0
+    self.lcd_clear()
+
+  def lcd_clear(self):
+    self.Address = 0
+    self.Lines = [[" "] * DisplayWidth for _ in DisplayLineOffsets]
+
+  def lcd_write(self, Value, Mode = 0):
+    self.Writes += 1
+    if Mode != self.Rs:
+      if Value & 0x80:
+        self.Address = Value & 0x7F
+      return
+    for Line in range(len(DisplayLineOffsets)):
+      Column = self.Address - DisplayLineOffsets[Line]
+      if 0 <= Column < DisplayWidth:
+        self.Lines[Line][Column] = chr(Value)
+    self.Address += 1
+
+  def GetLines(self):
+    return ["".join(Line) for Line in self.Lines]
+
+class RecordedLED:
+  __slots__ = ("Changes", "Pin", "is_lit")
+
+  def __init__(self, Pin):
+    self.Changes = deque(maxlen=SimulationHistoryLength)
+    self.Pin = Pin
+    self.is_lit = False
+
+  def on(self):
+    self.SetState(True)
+
+  def off(self):
+    self.SetState(False)
+
+  def SetState(self, State):
+    if State != self.is_lit:
+      self.is_lit = State
+      self.Changes.append((GetMonotonicTime(), State))
+
+class SimulatedDiscordChannel:
+  __slots__ = ("Sent",)
+
+  def __init__(self):
+    self.Sent = deque(maxlen=SimulationHistoryLength)
+
+  async def send(self, Content):
+    self.Sent.append((GetMonotonicTime(), Content))
+    WriteToMainLog("Simulated Discord message sent:\n" + Content)
+
+class SimulationRequestHandler(BaseHTTPRequestHandler):
+  def do_GET(self):
+    self.Respond(True)
+
+  def do_HEAD(self):
+    self.Respond(False)
+
+  def Respond(self, SendBody):
+    Address = urlsplit(self.path)
+    Status = 204
+    Body = None
+    Headers = {"Last-Modified": formatdate(GetCurrentTime().timestamp(), usegmt=True)}
+    if Address.path == "/v1/data":
+      CountSimulatedRequest("API")
+      Status, Body = BuildSimulatedAPIResponse(parse_qs(Address.query))
+    elif Address.path.startswith("/network/"):
+      CountSimulatedRequest("Network")
+    elif Address.path.startswith("/banners/"):
+      CountSimulatedRequest("Banners")
+      Status, Body = BuildSimulatedBannerResponse(unquote(Address.path[len("/banners/"):]))
+      if Body != None:
+        Headers["ETag"] = "\"" + sha1(Body.encode()).hexdigest() + "\""
+        if self.headers.get("If-None-Match") == Headers["ETag"]:
+          Status = 304
+          Body = None
+    self.send_response(Status)
+    for Header in Headers:
+      self.send_header(Header, Headers[Header])
+    if Body != None:
+      Body = Body.encode()
+      self.send_header("Content-Type", "application/json")
+      self.send_header("Content-Length", str(len(Body)))
+    self.end_headers()
+    if SendBody and Body != None:
+      self.wfile.write(Body)
+
+  def log_message(self, Format, *Arguments):
+    pass
+
+def StartSimulation(RecordingsFilename, Directory = None):
+  global Simulated, SimulationChannel, SimulationDirectory, SimulationRecordings, SimulationServer
+  if Directory == None:
+    Directory = mkdtemp(prefix="UKCOVID19-")
+  os.makedirs(Directory, exist_ok=True)
+  SimulationDirectory = Directory
+  UseSimulationFiles()
+  if not os.path.isfile(Files["AllData"]):
+    open(Files["AllData"], 'w').close()
+  if not os.path.isfile(Files["RollAvgPeaks"]):
+    CommitToFile(None, CalculateRollAvgPeaks(MassDataColumns()))
+  WriteToMainLog("Simulation files are kept in " + Directory + ".")
+  WriteToMainLog("Starting simulated hardware, Discord and API from " + RecordingsFilename + ". . .")
+  with open(RecordingsFilename) as RecordingsFile:
+    SimulationRecordings = loads(RecordingsFile.read())
+  SimulationRecordings.setdefault("API", [])
+  SimulationRecordings.setdefault("Banners", {})
+  SimulationRecordings["API"].sort(key=lambda Row: Row["date"], reverse=True)
+  for Row in SimulationRecordings["API"]:
+    SimulationReleaseTimes[Row["date"]] = ParseReleaseTimestamp(Row)
+  SimulationChannel = SimulatedDiscordChannel()
+  SimulationServer = ThreadingHTTPServer(("127.0.0.1", 0), SimulationRequestHandler)
+  threading.Thread(target=SimulationServer.serve_forever, name="SimulationServer", daemon=True).start()
+  Simulated = True
+  WriteToMainLog("Simulated API serving on port " + str(SimulationServer.server_port) + ".")
+
+def UseSimulationFiles():
+  for Name in SimulationFiles:
+    Files[Name] = os.path.join(SimulationDirectory, SimulationFiles[Name])
+  if Replaying:
+    Files["PublishTimes"] = None
+
+def ResolveAddress(Address, Kind):
+  if not Simulated:
+    return Address
+  return "http://127.0.0.1:" + str(SimulationServer.server_port) + "/" + Kind + "/" + quote(Address, safe="")
+
+def BuildSimulatedAPIResponse(Parameters):
+  Rows = [Row for Row in SimulationRecordings["API"] if IsReleased(Row)]
+  for Filter in Parameters.get("filters", [""])[0].split(";"):
+    if Filter.startswith("date="):
+      Rows = [Row for Row in Rows if Row["date"] == Filter[len("date="):]]
+  if Parameters.__contains__("latestBy"):
+    Rows = [Row for Row in Rows if Row.get(Parameters["latestBy"][0]) != None][0:1]
+  elif len(Rows) == 0 or int(Parameters.get("page", ["1"])[0]) > 1:
+    return 204, None
+  Structure = loads(Parameters["structure"][0])
+  Data = [{Name: Row.get(Structure[Name]) for Name in Structure} for Row in Rows]
+  return 200, dumps({"length": len(Data), "data": Data})
+
+def BuildSimulatedBannerResponse(Address):
+  if not SimulationRecordings["Banners"].__contains__(Address):
+    return 404, None
+  return 200, dumps(SimulationRecordings["Banners"][Address])
+
+class ReplaySelector(selectors.DefaultSelector):
+  def select(self, timeout = None):
+    global ReplayClock
+    if ReplayBusy == 0 and timeout != None:
+      ReplayClock += timeout
+      return super().select(0)
+    Start = time.monotonic()
+    Events = super().select(timeout)
+    ReplayClock += time.monotonic() - Start
+    return Events
+
+class ReplayEventLoop(asyncio.SelectorEventLoop):
+  def time(self):
+    return ReplayClock
+
+def StartReplay(StartDate, Days):
+  global ReplayEpoch, Replaying
+  if not Simulated:
+    raise Exception("Replay requires simulation to be started with --simulate.")
+  ReplayEpoch = time.mktime(StartDate.timetuple())
+  Replaying = True
+  UseSimulationFiles()
+  Loop = ReplayEventLoop(ReplaySelector())
+  asyncio.set_event_loop(Loop)
+  DiscordClient.loop = Loop
+  Loop.create_task(RunReplay(StartDate, Days))
+  WriteToMainLog("Replaying " + str(Days) + " days from " + StartDate.isoformat() + ".")
+
+async def RunReplay(StartDate, Days):
+  global ReplayFinished
+  ReplayStart = time.monotonic()
+  Report = [
+    "Date".ljust(12) + "Released".rjust(10) + "Found".rjust(10) + "Latency (s)".rjust(13) + "Post (ms)".rjust(11) + "API".rjust(6) + "Banners".rjust(9) + "Network".rjust(9) + "Sent".rjust(6) + "CPU (ms)".rjust(10)
+  ]
+  for Day in range(Days):
+    CurrentDate = StartDate + timedelta(days=Day)
+    CPUStart = time.process_time()
+    RequestsStart = dict(SimulationRequests)
+    NotificationsStart = MetricCounters.get("discord_notifications_total", 0)
+    MetricGauges.pop("publish_to_post_seconds", None)
+    await asyncio.sleep((datetime.combine(CurrentDate + timedelta(days=1), datetime.min.time()) - GetCurrentTime()).total_seconds())
+    Released = GetReplayReleaseTime(CurrentDate.isoformat())
+    Found = GetPublishTimes().get(CurrentDate.isoformat())
+    Latency = "-"
+    if Released != None and Found != None:
+      Latency = str(round((datetime.combine(CurrentDate, datetime.strptime(Found, "%H:%M:%S").time()) - Released).total_seconds()))
+    Post = "-"
+    if MetricGauges.__contains__("publish_to_post_seconds"):
+      Post = str(round(MetricGauges["publish_to_post_seconds"] * 1000, 1))
+    Report.append(CurrentDate.isoformat().ljust(12) + (Released.strftime("%H:%M:%S") if Released != None else "-").rjust(10) + (Found or "-").rjust(10) + Latency.rjust(13) + Post.rjust(11) + str(SimulationRequests["API"] - RequestsStart["API"]).rjust(6) + str(SimulationRequests["Banners"] - RequestsStart["Banners"]).rjust(9) + str(SimulationRequests["Network"] - RequestsStart["Network"]).rjust(9) + str(MetricCounters.get("discord_notifications_total", 0) - NotificationsStart).rjust(6) + str(round((time.process_time() - CPUStart) * 1000)).rjust(10))
+  Report.append("Replayed " + str(Days) + " days in " + str(round(time.monotonic() - ReplayStart, 1)) + " seconds.")
+  WriteToMainLog("Replay complete:\n" + "\n".join(Report))
+  print("\n".join(Report))
+  ReplayFinished = True
+  FlushLogs()
+  asyncio.get_event_loop().stop()
+
+def GetReplayReleaseTime(Date):
+  return SimulationReleaseTimes.get(Date)
+
+def IsReleased(Row):
+  return SimulationReleaseTimes[Row["date"]] <= GetCurrentTime()
+
+def ParseReleaseTimestamp(Row):
+  if not Row.__contains__("releaseTimestamp"):
+    return datetime.strptime(Row["date"], "%Y-%m-%d")
+  Offset = Row["releaseTimestamp"][19:].lstrip(".0123456789")
+  if Offset == "":
+    return datetime.strptime(Row["releaseTimestamp"][0:19], "%Y-%m-%dT%H:%M:%S")
+  if Offset == "Z":
+    Offset = "+0000"
+  Released = datetime.strptime(Row["releaseTimestamp"][0:19] + Offset.replace(":", ""), "%Y-%m-%dT%H:%M:%S%z")
+  return Released.astimezone().replace(tzinfo=None)
+
+def CountSimulatedRequest(Kind):
+  with SimulationLock:
+    SimulationRequests[Kind] += 1
+
+ImportTime = time.monotonic() - ImportStartTime
+
 if __name__ == "__main__":
+  StartupTime = time.monotonic()
+  if sys.argv.__contains__("--simulate"):
+    SimulationDirectoryName = None
+    if sys.argv.__contains__("--simulate-dir"):
+      SimulationDirectoryName = sys.argv[sys.argv.index("--simulate-dir") + 1]
+    StartSimulation(sys.argv[sys.argv.index("--simulate") + 1], SimulationDirectoryName)
+  if sys.argv.__contains__("--replay"):
+    ReplayArguments = sys.argv[sys.argv.index("--replay") + 1:sys.argv.index("--replay") + 3]
+    StartReplay(datetime.strptime(ReplayArguments[0], "%Y-%m-%d").date(), int(ReplayArguments[1]))
+  InitialiseHardware()
   try:
     WriteToMainLog("PROGRAM START, Version " + Version)
     POST()
     LoadConfig()
     if BeginTime < TimeoutTime:
       raise Exception("Timeout time is later than the start time.")
+    RecordStartupTiming("Import", ImportTime)
+    InitialiseAPIs()
     WaitForNetwork()
     ReloadLastOutput()
+    RecordStartupTiming("StartupToDisplay", time.monotonic() - StartupTime)
     DiscordClient.loop.create_task(TimeReview())
-    DiscordClient.run(BotToken)
+    DiscordClient.loop.create_task(StartMetricsServer())
+    DiscordClient.loop.create_task(StartBlockingDetector())
+    if Simulated:
+      DiscordClient.loop.create_task(on_ready())
+      DiscordClient.loop.run_forever()
+    else:
+      DiscordClient.run(BotToken)
   except:
+    FlushLogs()
     ErrorLED.on()
     OldLED.off()
     NewLED.off()
-    Display.lcd_clear()
-    Display.lcd_display_string("WARNING!".center(20),1)
-    Display.lcd_display_string("The script has quit.",2)
+    ClearDisplay()
+    DisplayString("WARNING!".center(20), 1)
+    DisplayString("The script has quit.", 2)
     ErrorLogFilename = Files["ErrorLogs"] + "Error_" + datetime.now().strftime("%Y-%m-%dT%H%M%S") + ".txt"
     with open(ErrorLogFilename,'a') as ErrorFile:
       ErrorFile.write("[" + datetime.now().astimezone().replace(microsecond=0).isoformat(sep='T') + "] Fatal Error (Exception point 2) {\n")
       ErrorFile.write(traceback.format_exc())
       ErrorFile.write("\n}\n")
-  while True:
+  while not ReplayFinished:
     ErrorLED.off()
     time.sleep(0.9)
     ErrorLED.on()